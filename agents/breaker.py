@@ -1,7 +1,9 @@
-from pydantic import BaseModel
-from typing import Optional, List, Any, Dict
+from pydantic import BaseModel, ValidationError
+from typing import Optional, List, Any, Dict, Callable
 from agents.llm import LiteLLMWrapper
+from utils.json_stream import StreamingArrayParser
 from uuid import uuid4
+import json
 from dotenv import load_dotenv
 import os
 
@@ -88,6 +90,89 @@ Return your output in the exact JSON format:
   ]
 }}'''
 
+    def _build_prompt(self, request: BreakerRequest) -> str:
+        """Build the user prompt and update the generation language from the request metadata"""
+        if request.metadata and isinstance(request.metadata, dict):
+            self.language = request.metadata.get("language", "Chinese")
+        
+        follow_up_text = f"\nFollow-up question:\n{request.followUpQuestion}" if request.followUpQuestion else ""
+        
+        return f"Original problem: {request.originalInput}{follow_up_text}"
+
+    def _to_subproblem(self, subproblem_data: Dict) -> Dict:
+        """Assign an id to a raw subproblem and validate it"""
+        subproblem_data["id"] = str(uuid4())
+        subproblem = subProblem(**subproblem_data)
+        #TODO check subproblem type
+        return subproblem.to_dict()
+
+    def _parse_subproblem(self, subproblem_data: Any) -> Optional[Dict]:
+        """Validated subproblem with its id, or None (logged) for an item that is not a valid subproblem"""
+        if not isinstance(subproblem_data, dict):
+            self.logger.warning(f"Skipping invalid subproblem: expected an object, got {type(subproblem_data).__name__}")
+            return None
+        try:
+            return self._to_subproblem(subproblem_data)
+        except ValidationError as e:
+            self.logger.warning(f"Skipping invalid subproblem: {str(e)}")
+            return None
+
+    def _build_result(
+        self,
+        request: BreakerRequest,
+        response: Any,
+        subproblems: Optional[List[Dict]] = None,
+        consumed: Optional[int] = None
+    ) -> Dict:
+        """
+        Parse the LLM response into the breakdown result dictionary
+
+        Invalid subproblems are skipped and the valid ones kept, the same way
+        stream_break_down_problem handles them.
+        
+        Args:
+            request: BreakerRequest containing the problem details
+            response: Raw JSON text (or already parsed dictionary) returned by the LLM
+            subproblems: Subproblems already extracted while streaming; they keep their ids
+            consumed: Objects of the subProblems array already handled while streaming,
+                valid or not; len(subproblems) when None
+        """
+        if isinstance(response, str):
+            try:
+                response = json.loads(response)
+            except json.JSONDecodeError:
+                raise ValueError("Invalid JSON response from LLM")
+
+        subproblems = list(subproblems or [])
+        skip = len(subproblems) if consumed is None else consumed
+        for subproblem_data in response.get("subProblems", []):
+            # The streaming parser only yields objects, so only objects count as handled
+            if skip and isinstance(subproblem_data, dict):
+                skip -= 1
+                continue
+            subproblem = self._parse_subproblem(subproblem_data)
+            if subproblem is not None:
+                subproblems.append(subproblem)
+        
+        response["subProblems"] = subproblems
+        
+        return {
+            "success": True,
+            "followUpQuestion": request.followUpQuestion,
+            "parentId": None,
+            "data": response
+        }
+
+    def _build_error(self, request: BreakerRequest, error: Exception) -> Dict:
+        """Log a failed breakdown and build its result dictionary"""
+        self.logger.error(f"Problem breakdown failed: {str(error)}")
+        return {
+            "success": False,
+            "followUpQuestion": request.followUpQuestion,
+            "parentId": None,
+            "data": {"error": str(error)}
+        }
+
     async def break_down_problem(self, request: BreakerRequest) -> Dict:
         """
         Break down a problem into subproblems and return dictionary
@@ -99,14 +184,9 @@ Return your output in the exact JSON format:
             Dictionary containing the breakdown results
         """
         try:
-            if request.metadata and isinstance(request.metadata, dict):
-                self.language = request.metadata.get("language", "Chinese")
-            
-            follow_up_text = f"\nFollow-up question:\n{request.followUpQuestion}" if request.followUpQuestion else ""
-            
-            prompt = f"Original problem: {request.originalInput}{follow_up_text}"
+            prompt = self._build_prompt(request)
 
-            response = self.generate(
+            response = await self.agenerate(
                 prompt=prompt,
                 system_message=self._get_system_prompt(
                     original_input=request.originalInput,
@@ -115,39 +195,64 @@ Return your output in the exact JSON format:
                 json_mode=True
             )
 
-            if isinstance(response, str):
-                import json
-                try:
-                    response = json.loads(response)
-                except json.JSONDecodeError:
-                    raise ValueError("Invalid JSON response from LLM")
-            
+            return self._build_result(request, response)
 
+        except Exception as e:
+            return self._build_error(request, e)
 
-            subproblems = []
-            for subproblem_data in response.get("subProblems", []):
-                subproblem_data["id"] = str(uuid4())
-                subproblem = subProblem(**subproblem_data)
-                #TODO check subproblem type
-                subproblems.append(subproblem.to_dict())
-            
-            response["subProblems"] = subproblems
-            
-            return {
-                "success": True,
-                "followUpQuestion": request.followUpQuestion,
-                "parentId": None,
-                "data": response
-            }
+    async def stream_break_down_problem(
+        self,
+        request: BreakerRequest,
+        on_subproblem: Optional[Callable[[Dict], None]] = None
+    ) -> Dict:
+        """
+        Break down a problem while parsing the JSON response as it is streamed
+        
+        Each subproblem is passed to on_subproblem as soon as its object in the
+        subProblems array is complete, so callers can start working on it before
+        the rest of the response has been generated. Invalid items are skipped,
+        so a published subproblem is never taken back by a failed validation.
+        
+        Args:
+            request: BreakerRequest containing the problem details
+            on_subproblem: Callback receiving every subproblem dictionary (with its id) in order
+        
+        Returns:
+            Dictionary containing the breakdown results, same as break_down_problem
+        """
+        streamed = []
+        consumed = 0
+
+        def publish(subproblem: Dict) -> None:
+            streamed.append(subproblem)
+            if on_subproblem:
+                on_subproblem(subproblem)
+
+        try:
+            prompt = self._build_prompt(request)
+            parser = StreamingArrayParser("subProblems")
+
+            async for delta in self.astream(
+                prompt=prompt,
+                system_message=self._get_system_prompt(
+                    original_input=request.originalInput,
+                    follow_up_question=request.followUpQuestion
+                ),
+                json_mode=True
+            ):
+                for subproblem_data in parser.feed(delta):
+                    consumed += 1
+                    subproblem = self._parse_subproblem(subproblem_data)
+                    if subproblem is not None:
+                        publish(subproblem)
+
+            result = self._build_result(request, parser.text, streamed, consumed)
+            for subproblem in result["data"]["subProblems"][len(streamed):]:
+                publish(subproblem)
+            return result
 
         except Exception as e:
-            self.logger.error(f"Problem breakdown failed: {str(e)}")
-            return {
-                "success": False,
-                "followUpQuestion": request.followUpQuestion,
-                "parentId": None,
-                "data": {"error": str(e)}
-            }
+            return self._build_error(request, e)
 
     async def process_request(self, request: BreakerRequest) -> Dict:
         """
@@ -161,6 +266,23 @@ Return your output in the exact JSON format:
         """
         return await self.break_down_problem(request)
 
+    async def stream_process_request(
+        self,
+        request: BreakerRequest,
+        on_subproblem: Optional[Callable[[Dict], None]] = None
+    ) -> Dict:
+        """
+        Streaming entry point for processing breaker requests
+        
+        Args:
+            request: BreakerRequest object containing all necessary information
+            on_subproblem: Callback receiving each subproblem as soon as it is parsed
+            
+        Returns:
+            Dictionary with the results
+        """
+        return await self.stream_break_down_problem(request, on_subproblem)
+
 # Usage example:
 if __name__ == "__main__":
     import asyncio
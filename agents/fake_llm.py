@@ -0,0 +1,192 @@
+from typing import Any, AsyncGenerator, Dict, List, Optional
+from types import SimpleNamespace
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Route every model to the fake backend, not only "fake/<profile>" model names
+FAKE_LLM_ENABLED = os.getenv("FAKE_LLM", "false").lower() in ("1", "true", "yes")
+FAKE_LLM_PROFILE = os.getenv("FAKE_LLM_PROFILE", "realistic")
+FAKE_LLM_SEED = int(os.getenv("FAKE_LLM_SEED", "0"))
+
+# Latency and failure profiles: time-to-first-token (s), tokens/sec, error rate, 429 rate
+PROFILES: Dict[str, Dict[str, float]] = {
+    "instant": {"ttft": 0.0, "tps": 0.0, "error_rate": 0.0, "rate_limit_rate": 0.0},
+    "fast": {"ttft": 0.05, "tps": 500.0, "error_rate": 0.0, "rate_limit_rate": 0.0},
+    "realistic": {"ttft": 0.8, "tps": 40.0, "error_rate": 0.0, "rate_limit_rate": 0.0},
+    "slow": {"ttft": 3.0, "tps": 15.0, "error_rate": 0.0, "rate_limit_rate": 0.0},
+    "flaky": {"ttft": 0.8, "tps": 40.0, "error_rate": 0.05, "rate_limit_rate": 0.1},
+}
+
+_WORDS = (
+    "the system model data request response node tree context solution approach step "
+    "result value service layer cache query index latency input output design pattern "
+    "component interface state function process user problem goal method structure"
+).split()
+
+# Drives injected failures; content itself is derived from the request only
+_failures = random.Random(FAKE_LLM_SEED)
+
+
+class FakeLLMError(Exception):
+    """Injected transient provider failure"""
+    status_code = 503
+
+
+class FakeRateLimitError(FakeLLMError):
+    """Injected provider rate limit"""
+    status_code = 429
+
+
+def is_fake_model(model: Optional[str]) -> bool:
+    """Whether requests for model are served by the fake backend"""
+    return FAKE_LLM_ENABLED or bool(model and model.startswith("fake/"))
+
+
+def get_profile(model: Optional[str]) -> Dict[str, float]:
+    """
+    Resolve the latency profile of a fake model; FAKE_LLM_TTFT, FAKE_LLM_TPS,
+    FAKE_LLM_ERROR_RATE and FAKE_LLM_RATE_LIMIT_RATE override single values
+
+    Args:
+        model: Model name, "fake/<profile>" selects one of PROFILES
+    """
+    name = model.split("/", 1)[1] if model and model.startswith("fake/") else FAKE_LLM_PROFILE
+    profile = dict(PROFILES.get(name, PROFILES["realistic"]))
+    for key in profile:
+        value = os.getenv(f"FAKE_LLM_{key.upper()}")
+        if value is not None:
+            profile[key] = float(value)
+    return profile
+
+
+def _extract(pattern: str, text: str, default: str) -> str:
+    match = re.search(pattern, text)
+    return match.group(1).strip() if match else default
+
+
+def _words(rng: random.Random, count: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(count))
+
+
+def _breaker_json(prompt: str, rng: random.Random) -> str:
+    """Schema-valid breaker output derived from the prompt"""
+    original = _extract(r"Original problem: (.*)", prompt, prompt[:200])
+    follow_up = _extract(r"Follow-up question:\n(.*)", prompt, "None")
+    focus = follow_up if follow_up != "None" else original
+    sub_problems = [
+        {
+            "title": f"Part {i + 1}: {_words(rng, 3)}",
+            "description": f"Work out how to {focus[:80]} with respect to the {_words(rng, 12)}.",
+            "objective": f"Covers the {_words(rng, 6)} needed for the overall request."
+        }
+        for i in range(3)
+    ]
+    return json.dumps({
+        "problem": focus,
+        "originalRequest": original,
+        "followUpQuestion": follow_up,
+        "mainObjective": f"Provide a complete answer to: {focus[:120]}",
+        "subProblems": sub_problems
+    })
+
+
+def _solver_markdown(prompt: str, rng: random.Random, max_tokens: int) -> str:
+    """Markdown answer derived from the prompt, roughly max_tokens tokens long"""
+    title = _extract(r"Title: (.*)", prompt, "Solution")
+    sections = [f"## {title}\n"]
+    budget = max(max_tokens, 40)
+    while budget > 0:
+        sections.append(f"### {_words(rng, 3).capitalize()}\n\n{_words(rng, 40).capitalize()}.\n")
+        sections.append(f"```python\nresult = {rng.choice(_WORDS)}({rng.choice(_WORDS)})\n```\n")
+        sections.append("$$ O(n \\log n) $$\n")
+        budget -= 70
+    return "\n".join(sections)
+
+
+def _tokens(text: str) -> List[str]:
+    """Split text into word-sized pieces that concatenate back to text"""
+    return re.findall(r"\S+\s*|\s+", text)
+
+
+def _render(request: Dict[str, Any]) -> str:
+    messages = request.get("messages") or []
+    digest = hashlib.sha256(json.dumps(messages, sort_keys=True).encode("utf-8")).hexdigest()
+    rng = random.Random(f"{FAKE_LLM_SEED}:{digest}")
+    prompt = messages[-1]["content"] if messages else ""
+    if (request.get("response_format") or {}).get("type") == "json_object":
+        return _breaker_json(prompt, rng)
+    return _solver_markdown(prompt, rng, min(request.get("max_tokens") or 400, 400))
+
+
+def _maybe_fail(profile: Dict[str, float]) -> None:
+    roll = _failures.random()
+    if roll < profile["rate_limit_rate"]:
+        raise FakeRateLimitError("Fake provider rate limit exceeded")
+    if roll < profile["rate_limit_rate"] + profile["error_rate"]:
+        raise FakeLLMError("Fake provider unavailable")
+
+
+def _response(model: str, request: Dict[str, Any], content: str) -> SimpleNamespace:
+    prompt_tokens = sum(len(m.get("content") or "") for m in request.get("messages") or []) // 4
+    completion_tokens = len(_tokens(content))
+    return SimpleNamespace(
+        model=model,
+        choices=[SimpleNamespace(message=SimpleNamespace(role="assistant", content=content), finish_reason="stop")],
+        usage=SimpleNamespace(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens
+        )
+    )
+
+
+async def _stream(profile: Dict[str, float], content: str, usage: Optional[SimpleNamespace] = None) -> AsyncGenerator[SimpleNamespace, None]:
+    await asyncio.sleep(profile["ttft"])
+    tokens = _tokens(content)
+    # Emit several tokens per chunk when the token rate is faster than the event loop should tick
+    per_chunk = max(1, int(profile["tps"] / 100)) if profile["tps"] else len(tokens) or 1
+    for i in range(0, len(tokens), per_chunk):
+        if profile["tps"]:
+            await asyncio.sleep(per_chunk / profile["tps"])
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content="".join(tokens[i:i + per_chunk])))])
+    if usage is not None:
+        # Like OpenAI with stream_options={"include_usage": True}: a last chunk without choices
+        yield SimpleNamespace(choices=[], usage=usage)
+
+
+async def fake_acompletion(model: str, messages: List[Dict[str, str]], stream: bool = False, **kwargs) -> Any:
+    """
+    Drop-in replacement for litellm.acompletion backed by deterministic fake content
+
+    Breaker-style JSON requests get schema-valid breakdowns, everything else a
+    markdown answer. Latency, streaming speed and injected 5xx/429 failures
+    follow the model's profile.
+    """
+    profile = get_profile(model)
+    request = dict(kwargs, model=model, messages=messages)
+    _maybe_fail(profile)
+    content = _render(request)
+    if stream:
+        usage = _response(model, request, content).usage if (kwargs.get("stream_options") or {}).get("include_usage") else None
+        return _stream(profile, content, usage)
+    duration = profile["ttft"] + (len(_tokens(content)) / profile["tps"] if profile["tps"] else 0.0)
+    await asyncio.sleep(duration)
+    return _response(model, request, content)
+
+
+def fake_completion(model: str, messages: List[Dict[str, str]], **kwargs) -> Any:
+    """Blocking counterpart of fake_acompletion for scripts"""
+    profile = get_profile(model)
+    request = dict(kwargs, model=model, messages=messages)
+    _maybe_fail(profile)
+    content = _render(request)
+    time.sleep(profile["ttft"] + (len(_tokens(content)) / profile["tps"] if profile["tps"] else 0.0))
+    return _response(model, request, content)
@@ -1,9 +1,15 @@
-from typing import Optional, List, Dict, Any
-from litellm import completion
+from typing import Optional, List, Dict, Any, AsyncGenerator
+from litellm import completion, acompletion
 import logging
 from dotenv import load_dotenv
 import os
 
+from agents.llm_cache import completion_cache, request_key
+from agents.llm_coalesce import single_flight
+from agents.llm_ratelimit import rate_limiter, estimate_tokens, prompt_tokens
+from agents.llm_retry import resilient_caller
+from agents.fake_llm import is_fake_model, fake_acompletion, fake_completion
+
 load_dotenv()
 
 MODEL_NAME = os.getenv("MODEL_NAME")
@@ -14,6 +20,7 @@ class LiteLLMWrapper:
         model: str = MODEL_NAME,
         temperature: float = 0.7,
         max_tokens: Optional[int] = int(MAX_TOKENS) if MAX_TOKENS else None,
+        use_cache: bool = True,
     ):
         """
         Initialize the LLM wrapper
@@ -22,10 +29,12 @@ class LiteLLMWrapper:
             model: LLM model name
             temperature: Generation temperature (higher = more random, lower = more deterministic)
             max_tokens: Maximum number of tokens to generate (defaults to MAX_TOKENS from env)
+            use_cache: Whether calls may be served from the completion cache (when LLM_CACHE_ENABLED is set)
         """
         self.model = model
         self.temperature = temperature
         self.max_tokens = max_tokens
+        self.use_cache = use_cache
         
         # Set up logging
         logging.basicConfig(level=logging.INFO)
@@ -38,10 +47,11 @@ class LiteLLMWrapper:
         max_tokens: Optional[int] = None,
         stop: Optional[List[str]] = None,
         json_mode: bool = False,
+        use_cache: Optional[bool] = None,
     ) -> str:
 
         """
-        Generate a response with error handling
+        Generate a response with error handling (blocking, for scripts only)
         
         Args:
             prompt: Input prompt for generation
@@ -49,6 +59,7 @@ class LiteLLMWrapper:
             max_tokens: Maximum number of tokens to generate
             stop: List of stop sequences
             json_mode: Whether to force JSON format response
+            use_cache: Per-call override of the wrapper's use_cache setting
             
         Returns:
             Generated text content
@@ -56,22 +67,215 @@ class LiteLLMWrapper:
         try:
             messages = self._prepare_messages(prompt, system_message, json_mode)
             
-            response = completion(
-                model=self.model,
-                messages=messages,
-                temperature=self.temperature,
-                max_tokens=max_tokens or self.max_tokens,
-                stop=stop,
-                response_format={"type": "json_object"} if json_mode else None
-            )
+            request = self._build_request(messages, max_tokens, stop, json_mode)
+            key = self._cache_key(request, use_cache)
+            cached = completion_cache.get(key) if key else None
+            if cached is not None:
+                return cached
+            
+            completion_fn = fake_completion if is_fake_model(self.model) else completion
+            response = completion_fn(**request)
             
             self._log_response(response)
-            return response.choices[0].message.content
+            content = response.choices[0].message.content
+            if key:
+                completion_cache.set(key, content)
+            return content
+
+        except Exception as e:
+            self._handle_error(e, prompt)
+            raise
+
+    async def agenerate(
+        self,
+        prompt: str,
+        system_message: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        stop: Optional[List[str]] = None,
+        json_mode: bool = False,
+        use_cache: Optional[bool] = None,
+    ) -> str:
+        """
+        Generate a response without blocking the event loop
+        
+        Args:
+            prompt: Input prompt for generation
+            system_message: Optional system message
+            max_tokens: Maximum number of tokens to generate
+            stop: List of stop sequences
+            json_mode: Whether to force JSON format response
+            use_cache: Per-call override of the wrapper's use_cache setting
+            
+        Returns:
+            Generated text content
+        """
+        try:
+            messages = self._prepare_messages(prompt, system_message, json_mode)
+            return await self._acomplete(messages, max_tokens, stop, json_mode, use_cache)
+
+        except Exception as e:
+            self._handle_error(e, prompt)
+            raise
+
+    async def astream(
+        self,
+        prompt: str,
+        system_message: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        stop: Optional[List[str]] = None,
+        json_mode: bool = False,
+        use_cache: Optional[bool] = None,
+    ) -> AsyncGenerator[str, None]:
+        """
+        Stream a response as text deltas while the model produces them
+        
+        Args:
+            prompt: Input prompt for generation
+            system_message: Optional system message
+            max_tokens: Maximum number of tokens to generate
+            stop: List of stop sequences
+            json_mode: Whether to force JSON format response
+            use_cache: Per-call override of the wrapper's use_cache setting
+            
+        Yields:
+            Generated text deltas
+        """
+        try:
+            messages = self._prepare_messages(prompt, system_message, json_mode)
+            async for delta in self._astream(messages, max_tokens, stop, json_mode, use_cache):
+                yield delta
 
         except Exception as e:
             self._handle_error(e, prompt)
             raise
 
+    def _build_request(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: Optional[int],
+        stop: Optional[List[str]],
+        json_mode: bool,
+    ) -> Dict[str, Any]:
+        """Build the keyword arguments for a litellm completion call"""
+        return {
+            "model": self.model,
+            "messages": messages,
+            "temperature": self.temperature,
+            "max_tokens": max_tokens or self.max_tokens,
+            "stop": stop,
+            "response_format": {"type": "json_object"} if json_mode else None,
+        }
+
+    def _cache_key(self, request: Dict[str, Any], use_cache: Optional[bool]) -> Optional[str]:
+        """Completion cache key for a request, or None when this call must not use the cache"""
+        use_cache = self.use_cache if use_cache is None else use_cache
+        if not (use_cache and completion_cache.enabled):
+            return None
+        return request_key(request)
+
+    async def _acomplete(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: Optional[int] = None,
+        stop: Optional[List[str]] = None,
+        json_mode: bool = False,
+        use_cache: Optional[bool] = None,
+    ) -> str:
+        """
+        Run a single completion through the provider's async client
+
+        The completion cache is consulted first; identical requests already in
+        flight share one upstream call, which is retried on transient errors.
+        """
+        request = self._build_request(messages, max_tokens, stop, json_mode)
+        key = self._cache_key(request, use_cache)
+        cached = completion_cache.get(key) if key else None
+        if cached is not None:
+            self.logger.info("Generation served from cache")
+            return cached
+
+        content = await single_flight.do(
+            key or request_key(request),
+            lambda: resilient_caller.call(self.model, lambda: self._provider_complete(request))
+        )
+        if key:
+            completion_cache.set(key, content)
+        return content
+
+    async def _astream(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: Optional[int] = None,
+        stop: Optional[List[str]] = None,
+        json_mode: bool = False,
+        use_cache: Optional[bool] = None,
+    ) -> AsyncGenerator[str, None]:
+        """
+        Run a single streaming completion through the provider's async client
+
+        A cached completion is replayed as a single delta; a fully streamed
+        completion is stored in the cache once it has finished. Identical
+        streams already in flight are shared, late joiners replay earlier deltas.
+        Transient errors are retried until the first delta has been produced.
+        """
+        request = self._build_request(messages, max_tokens, stop, json_mode)
+        key = self._cache_key(request, use_cache)
+        cached = completion_cache.get(key) if key else None
+        if cached is not None:
+            self.logger.info("Streaming generation served from cache")
+            yield cached
+            return
+
+        chunks = []
+        async for delta in single_flight.stream(
+            key or request_key(request),
+            lambda: resilient_caller.stream(self.model, lambda: self._provider_stream(request))
+        ):
+            chunks.append(delta)
+            yield delta
+        if key:
+            completion_cache.set(key, "".join(chunks))
+
+    def _acompletion_fn(self):
+        """Provider client for this wrapper's model: litellm, or the offline fake backend"""
+        return fake_acompletion if is_fake_model(self.model) else acompletion
+
+    async def _provider_complete(self, request: Dict[str, Any]) -> str:
+        """Call the provider for a complete response once the rate limiter admits it"""
+        estimated = estimate_tokens(request["messages"], request["max_tokens"])
+        async with rate_limiter.acquire(request["model"], estimated) as permit:
+            response = await self._acompletion_fn()(**request)
+            usage = getattr(response, "usage", None)
+            permit.used_tokens = getattr(usage, "total_tokens", None)
+        self._log_response(response)
+        return response.choices[0].message.content
+
+    async def _provider_stream(self, request: Dict[str, Any]) -> AsyncGenerator[str, None]:
+        """Call the provider for a streamed response and yield its text deltas once the rate limiter admits it"""
+        estimated = estimate_tokens(request["messages"], request["max_tokens"])
+        async with rate_limiter.acquire(request["model"], estimated) as permit:
+            usage = None
+            streamed_chars = 0
+            try:
+                # The final chunk then carries the usage of the whole stream
+                response = await self._acompletion_fn()(**request, stream=True, stream_options={"include_usage": True})
+                async for chunk in response:
+                    usage = getattr(chunk, "usage", None) or usage
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        streamed_chars += len(delta)
+                        yield delta
+            finally:
+                # Also settles streams that failed or were abandoned part way
+                used = getattr(usage, "total_tokens", None)
+                if used is None and streamed_chars:
+                    # Provider sent no usage: estimated from the prompt and the streamed text
+                    used = prompt_tokens(request["messages"]) + streamed_chars // 4
+                permit.used_tokens = used
+        self.logger.info("Streaming generation successful")
+
     def _prepare_messages(self, prompt: str, system_message: Optional[str], json_mode: bool) -> List[Dict[str, str]]:
         """Prepare the message list to send to the LLM"""
         messages = []
@@ -121,16 +325,7 @@ class LiteLLMWrapper:
                 # Add system message at the beginning of the history messages to require JSON format
                 messages = [{"role": "system", "content": "Please provide all responses in JSON format."}] + messages
             
-            response = await completion(
-                model=self.model,
-                messages=messages,
-                temperature=self.temperature,
-                max_tokens=max_tokens or self.max_tokens,
-                stop=stop,
-                json_mode=json_mode,
-                response_format={"type": "json_object"} if json_mode else None
-            )
-            return response.choices[0].message.content
+            return await self._acomplete(messages, max_tokens, stop, json_mode)
 
         except Exception as e:
             self.logger.error(f"Generation failed: {str(e)}")
@@ -173,17 +368,10 @@ class LiteLLMWrapper:
             
             messages.append({"role": "user", "content": prompt})
             
-            response = await completion(
-                model=self.model,
-                messages=messages,
-                temperature=self.temperature,
-                max_tokens=max_tokens or self.max_tokens,
-                stop=stop,
-                response_format={"type": "json_object"} if json_mode else None
-            )
+            content = await self._acomplete(messages, max_tokens, stop, json_mode)
             
             return {
-                "content": response.choices[0].message.content,
+                "content": content,
                 "context_used": context if context else [],
                 "model": self.model
             }
@@ -223,17 +411,10 @@ class LiteLLMWrapper:
                 last_msg = messages[-1]["content"]
                 messages[-1]["content"] = context_str + "\n\nQuestion: " + last_msg
             
-            response = await completion(
-                model=self.model,
-                messages=messages,
-                temperature=self.temperature,
-                max_tokens=max_tokens or self.max_tokens,
-                stop=stop,
-                response_format={"type": "json_object"} if json_mode else None
-            )
+            content = await self._acomplete(messages, max_tokens, stop, json_mode)
             
             return {
-                "content": response.choices[0].message.content,
+                "content": content,
                 "context_used": context if context else [],
                 "model": self.model
             }
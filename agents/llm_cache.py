@@ -0,0 +1,94 @@
+from typing import Optional, Dict, Any
+import hashlib
+import json
+import logging
+import os
+import time
+from cachebox import LRUCache
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "1024"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "3600"))
+
+
+def request_key(request: Dict[str, Any]) -> str:
+    """
+    Build a canonical hash for a completion request
+
+    Args:
+        request: Keyword arguments of the completion call (model, messages, temperature, ...)
+
+    Returns:
+        Hex digest identifying the request
+    """
+    canonical = json.dumps(request, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class CompletionCache:
+    """
+    Size-bounded LRU cache of completion texts whose entries also expire after a TTL
+    """
+
+    def __init__(
+        self,
+        maxsize: int = LLM_CACHE_SIZE,
+        ttl: float = LLM_CACHE_TTL,
+        enabled: bool = LLM_CACHE_ENABLED
+    ):
+        """
+        Initialize the cache
+
+        Args:
+            maxsize: Maximum number of cached completions
+            ttl: Seconds a cached completion stays valid
+            enabled: Whether lookups and stores are performed at all
+        """
+        self.enabled = enabled
+        self.ttl = ttl
+        self._entries = LRUCache(maxsize)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached completion for key, or None on a miss"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, content = entry
+            if expires_at > time.monotonic():
+                self.hits += 1
+                return content
+            self._entries.pop(key, None)
+        self.misses += 1
+        return None
+
+    def set(self, key: str, content: str) -> None:
+        """Store a completion under key"""
+        if content is None:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, content)
+
+    def clear(self) -> None:
+        """Drop every cached completion"""
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "size": len(self._entries),
+            "maxsize": self._entries.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+
+completion_cache = CompletionCache()
@@ -0,0 +1,148 @@
+from typing import Any, AsyncGenerator, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+import asyncio
+import logging
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+LLM_COALESCE_ENABLED = os.getenv("LLM_COALESCE_ENABLED", "true").lower() in ("1", "true", "yes")
+
+
+class _Call:
+    """An upstream call shared by every caller that issued the same request"""
+
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        self.waiters = 0
+        # Streaming state
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.changed = asyncio.Condition()
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical requests so that they share one upstream call
+
+    The first caller for a key starts the call; callers arriving while it is in
+    flight wait for the same result (or replay the same stream of deltas). The
+    upstream call is cancelled only when every caller has gone away.
+    """
+
+    def __init__(self, enabled: bool = LLM_COALESCE_ENABLED):
+        """
+        Initialize the coalescer
+
+        Args:
+            enabled: When False every caller gets its own upstream call
+        """
+        self.enabled = enabled
+        self._calls: Dict[str, _Call] = {}
+        self._streams: Dict[str, _Call] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    def _join(self, calls: Dict[str, _Call], key: str, start: Callable[[_Call], Awaitable[Any]]) -> _Call:
+        call = calls.get(key)
+        if call is None:
+            call = _Call()
+            call.task = asyncio.create_task(start(call))
+            calls[key] = call
+            call.task.add_done_callback(lambda _: calls.pop(key, None) if calls.get(key) is call else None)
+            self.leaders += 1
+        else:
+            self.followers += 1
+        call.waiters += 1
+        return call
+
+    def _leave(self, call: _Call) -> None:
+        call.waiters -= 1
+        if call.waiters == 0 and not call.task.done():
+            call.task.cancel()
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run factory() once for all concurrent callers using the same key
+
+        Args:
+            key: Canonical request key
+            factory: Coroutine function performing the upstream call
+
+        Returns:
+            Result of the shared upstream call
+        """
+        if not self.enabled:
+            return await factory()
+
+        call = self._join(self._calls, key, lambda _: factory())
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            self._leave(call)
+
+    async def stream(self, key: str, factory: Callable[[], AsyncIterator[str]]) -> AsyncGenerator[str, None]:
+        """
+        Consume factory() once for all concurrent callers using the same key
+
+        Callers that join late first replay the deltas produced so far.
+
+        Args:
+            key: Canonical request key
+            factory: Function returning the upstream async iterator of deltas
+
+        Yields:
+            Deltas of the shared upstream stream
+        """
+        if not self.enabled:
+            async for delta in factory():
+                yield delta
+            return
+
+        async def pump(call: _Call) -> None:
+            try:
+                async for delta in factory():
+                    async with call.changed:
+                        call.chunks.append(delta)
+                        call.changed.notify_all()
+            except BaseException as e:
+                call.error = e
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+            finally:
+                async with call.changed:
+                    call.done = True
+                    call.changed.notify_all()
+
+        call = self._join(self._streams, key, pump)
+        index = 0
+        try:
+            while True:
+                async with call.changed:
+                    await call.changed.wait_for(lambda: call.done or len(call.chunks) > index)
+                    chunks = call.chunks[index:]
+                    done = call.done
+                for delta in chunks:
+                    yield delta
+                index += len(chunks)
+                if done and index >= len(call.chunks):
+                    break
+            if call.error is not None:
+                raise call.error
+        finally:
+            self._leave(call)
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters of upstream calls started and of callers that joined an existing call"""
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self._calls) + len(self._streams),
+            "upstream_calls": self.leaders,
+            "coalesced_calls": self.followers
+        }
+
+
+single_flight = SingleFlight()
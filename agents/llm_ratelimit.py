@@ -0,0 +1,219 @@
+from typing import Any, AsyncIterator, Dict, List, Optional
+from contextlib import asynccontextmanager
+import asyncio
+import json
+import logging
+import os
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Process-wide defaults; 0 disables the corresponding limit
+LLM_RPM_LIMIT = int(os.getenv("LLM_RPM_LIMIT", "0"))
+LLM_TPM_LIMIT = int(os.getenv("LLM_TPM_LIMIT", "0"))
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "0"))
+# Per-model overrides, e.g. {"gpt-4o": {"rpm": 500, "tpm": 30000, "max_in_flight": 16}}
+LLM_RATE_LIMITS = json.loads(os.getenv("LLM_RATE_LIMITS", "{}"))
+
+# Completion budget assumed when a request does not set max_tokens
+DEFAULT_COMPLETION_TOKENS = 1024
+
+
+def prompt_tokens(messages: List[Dict[str, str]]) -> int:
+    """Rough token count of chat messages, about four characters per token"""
+    return sum(len(message.get("content") or "") for message in messages) // 4
+
+
+def estimate_tokens(messages: List[Dict[str, str]], max_tokens: Optional[int]) -> int:
+    """
+    Rough token cost of a request: about four characters per prompt token plus the completion budget
+
+    Args:
+        messages: Chat messages sent to the model
+        max_tokens: Completion token limit of the request
+    """
+    return prompt_tokens(messages) + (max_tokens or DEFAULT_COMPLETION_TOKENS)
+
+
+class TokenBucket:
+    """Token bucket refilled continuously up to a per-minute capacity"""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = float(per_minute)
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount: float) -> float:
+        """Seconds until amount can be taken (0 when it is available now)"""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount: float) -> None:
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+    def give(self, amount: float) -> None:
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class Permit:
+    """Admission to call the provider; set used_tokens once the real usage is known"""
+
+    def __init__(self, estimated_tokens: int):
+        self.estimated_tokens = estimated_tokens
+        self.used_tokens: Optional[int] = None
+
+
+class ModelLimiter:
+    """
+    Admission control for one model
+
+    Callers are admitted strictly in arrival order. The caller at the head of the
+    queue waits for an in-flight slot and then for request and token budget.
+    """
+
+    def __init__(self, rpm: int = 0, tpm: int = 0, max_in_flight: int = 0):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_in_flight = max_in_flight
+        self._requests = TokenBucket(rpm) if rpm > 0 else None
+        self._tokens = TokenBucket(tpm) if tpm > 0 else None
+        self._slots = asyncio.Semaphore(max_in_flight) if max_in_flight > 0 else None
+        self._queue = asyncio.Lock()
+        self.waiting = 0
+        self.in_flight = 0
+        self.admitted = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    async def _wait_for_budget(self, estimated_tokens: int) -> None:
+        while True:
+            delay = max(
+                self._requests.delay(1) if self._requests else 0.0,
+                self._tokens.delay(estimated_tokens) if self._tokens else 0.0
+            )
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+        if self._requests:
+            self._requests.take(1)
+        if self._tokens:
+            self._tokens.take(estimated_tokens)
+
+    @asynccontextmanager
+    async def acquire(self, estimated_tokens: int) -> AsyncIterator[Permit]:
+        """
+        Wait for admission and hold an in-flight slot for the duration of the block
+
+        Args:
+            estimated_tokens: Tokens charged against the per-minute budget up front
+        """
+        permit = Permit(estimated_tokens)
+        started = time.monotonic()
+        self.waiting += 1
+        slot_taken = False
+        try:
+            async with self._queue:
+                if self._slots:
+                    await self._slots.acquire()
+                    slot_taken = True
+                await self._wait_for_budget(estimated_tokens)
+        except BaseException:
+            if slot_taken:
+                self._slots.release()
+            raise
+        finally:
+            self.waiting -= 1
+
+        waited = time.monotonic() - started
+        self.admitted += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        self.in_flight += 1
+        try:
+            yield permit
+        finally:
+            self.in_flight -= 1
+            if self._slots:
+                self._slots.release()
+            if self._tokens and permit.used_tokens is not None:
+                # Refund (or charge) the difference between the estimate and the real usage
+                self._tokens.give(permit.estimated_tokens - permit.used_tokens)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rpm": self.rpm,
+            "tpm": self.tpm,
+            "max_in_flight": self.max_in_flight,
+            "queue_depth": self.waiting,
+            "in_flight": self.in_flight,
+            "admitted": self.admitted,
+            "avg_wait": self.total_wait / self.admitted if self.admitted else 0.0,
+            "max_wait": self.max_wait
+        }
+
+
+class RateLimiter:
+    """Process-wide scheduler enforcing per-model request, token and concurrency limits"""
+
+    def __init__(
+        self,
+        rpm: int = LLM_RPM_LIMIT,
+        tpm: int = LLM_TPM_LIMIT,
+        max_in_flight: int = LLM_MAX_IN_FLIGHT,
+        overrides: Optional[Dict[str, Dict[str, int]]] = None
+    ):
+        """
+        Initialize the scheduler
+
+        Args:
+            rpm: Default requests per minute per model (0 = unlimited)
+            tpm: Default tokens per minute per model (0 = unlimited)
+            max_in_flight: Default concurrent requests per model (0 = unlimited)
+            overrides: Per-model values for rpm, tpm and max_in_flight
+        """
+        self.defaults = {"rpm": rpm, "tpm": tpm, "max_in_flight": max_in_flight}
+        self.overrides = LLM_RATE_LIMITS if overrides is None else overrides
+        self._limiters: Dict[str, ModelLimiter] = {}
+
+    def limiter(self, model: str) -> ModelLimiter:
+        """Get (or create) the limiter of a model"""
+        limiter = self._limiters.get(model)
+        if limiter is None:
+            config = dict(self.defaults, **self.overrides.get(model, {}))
+            limiter = ModelLimiter(**config)
+            self._limiters[model] = limiter
+        return limiter
+
+    def acquire(self, model: str, estimated_tokens: int):
+        """
+        Wait for admission to call model
+
+        Args:
+            model: Model name
+            estimated_tokens: Estimated prompt plus completion tokens of the request
+
+        Returns:
+            Async context manager yielding a Permit
+        """
+        return self.limiter(model).acquire(estimated_tokens)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, in-flight requests and wait times per model"""
+        return {model: limiter.stats() for model, limiter in self._limiters.items()}
+
+
+rate_limiter = RateLimiter()
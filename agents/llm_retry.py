@@ -0,0 +1,267 @@
+from typing import Any, AsyncGenerator, AsyncIterator, Awaitable, Callable, Deque, Dict, Optional, Tuple
+from collections import deque
+import asyncio
+import logging
+import os
+import random
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "8"))
+# Deadline in seconds for one logical call to answer (or, for streams, to produce its
+# first token), covering every retry and hedge
+LLM_CALL_DEADLINE = float(os.getenv("LLM_CALL_DEADLINE", "180"))
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() in ("1", "true", "yes")
+LLM_HEDGE_QUANTILE = float(os.getenv("LLM_HEDGE_QUANTILE", "0.95"))
+# Latency samples needed before a hedging threshold is trusted
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504, 529}
+RETRYABLE_ERROR_NAMES = {
+    "RateLimitError",
+    "APIConnectionError",
+    "APITimeoutError",
+    "Timeout",
+    "ServiceUnavailableError",
+    "InternalServerError",
+}
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Classify an error raised by a completion call
+
+    Rate limits, timeouts, connection problems and 5xx responses are transient;
+    everything else (bad requests, authentication, content policy, ...) is not.
+    """
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    status_code = getattr(error, "status_code", None)
+    if isinstance(status_code, int):
+        return status_code in RETRYABLE_STATUS_CODES
+    return any(cls.__name__ in RETRYABLE_ERROR_NAMES for cls in type(error).__mro__)
+
+
+def backoff_delay(attempt: int, base: float = LLM_RETRY_BASE_DELAY, cap: float = LLM_RETRY_MAX_DELAY) -> float:
+    """Exponential backoff with full jitter for the given (0-based) retry attempt"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class LatencyTracker:
+    """Rolling window of call latencies per key, used to derive hedging thresholds"""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+
+    def record(self, key: str, latency: float) -> None:
+        self._samples.setdefault(key, deque(maxlen=self.window)).append(latency)
+
+    def quantile(self, key: str, q: float, min_samples: int = LLM_HEDGE_MIN_SAMPLES) -> Optional[float]:
+        """Latency quantile for key, or None while there are fewer than min_samples samples"""
+        samples = self._samples.get(key)
+        if not samples or len(samples) < min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class ResilientCaller:
+    """
+    Runs completion calls with classified retries, exponential jittered backoff,
+    a per-call deadline and optional hedging
+
+    With hedging enabled, a duplicate request is sent when the first one has not
+    answered (or, for streams, produced its first token) within the observed
+    latency quantile; whichever succeeds first wins and the other is cancelled.
+    """
+
+    def __init__(
+        self,
+        max_retries: int = LLM_MAX_RETRIES,
+        deadline: float = LLM_CALL_DEADLINE,
+        hedge_enabled: bool = LLM_HEDGE_ENABLED,
+        hedge_quantile: float = LLM_HEDGE_QUANTILE
+    ):
+        """
+        Initialize the caller
+
+        Args:
+            max_retries: Retries after the first attempt for transient errors
+            deadline: Seconds a logical call may take to answer or start streaming
+            hedge_enabled: Whether slow attempts are hedged with a duplicate request
+            hedge_quantile: Latency quantile after which an attempt is considered slow
+        """
+        self.max_retries = max_retries
+        self.deadline = deadline
+        self.hedge_enabled = hedge_enabled
+        self.hedge_quantile = hedge_quantile
+        self.latency = LatencyTracker()
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.deadline_exceeded = 0
+
+    def _hedge_threshold(self, key: str) -> Optional[float]:
+        if not self.hedge_enabled:
+            return None
+        return self.latency.quantile(key, self.hedge_quantile)
+
+    async def _race(
+        self,
+        key: str,
+        start: Callable[[], Awaitable[Any]],
+        deadline: float,
+        discard: Optional[Callable[[Any], None]] = None
+    ) -> Any:
+        """Run one attempt, hedged if it is slower than the latency threshold"""
+        loop = asyncio.get_running_loop()
+        threshold = self._hedge_threshold(key)
+        tasks: Dict[asyncio.Task, float] = {}
+
+        def launch() -> float:
+            started = loop.time()
+            tasks[asyncio.create_task(start())] = started
+            return started
+
+        primary_started = launch()
+        hedged = False
+        error: Optional[BaseException] = None
+        try:
+            while tasks:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    self.deadline_exceeded += 1
+                    raise asyncio.TimeoutError(f"LLM call exceeded its {self.deadline:.0f}s deadline")
+                timeout = remaining
+                if threshold is not None and not hedged:
+                    timeout = min(timeout, max(0.0, primary_started + threshold - loop.time()))
+
+                done, _ = await asyncio.wait(list(tasks), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    if threshold is not None and not hedged:
+                        hedged = True
+                        self.hedges += 1
+                        launch()
+                    continue
+
+                for task in done:
+                    started = tasks.pop(task)
+                    if task.exception() is None:
+                        self.latency.record(key, loop.time() - started)
+                        if started != primary_started:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if task.done() and not task.cancelled() and task.exception() is None:
+                    if discard:
+                        discard(task.result())
+                else:
+                    task.cancel()
+
+    def _should_retry(self, error: Exception, attempt: int, deadline: float) -> Optional[float]:
+        """Delay before the next attempt, or None when the error must be raised"""
+        if attempt >= self.max_retries or not is_retryable(error):
+            return None
+        delay = backoff_delay(attempt)
+        if asyncio.get_running_loop().time() + delay >= deadline:
+            return None
+        return delay
+
+    async def call(self, model: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run a non-streaming call
+
+        Args:
+            model: Model name, used to keep latency statistics per model
+            factory: Coroutine function performing one upstream attempt
+
+        Returns:
+            Result of the first successful attempt
+        """
+        deadline = asyncio.get_running_loop().time() + self.deadline
+        attempt = 0
+        while True:
+            try:
+                return await self._race(model, factory, deadline)
+            except Exception as e:
+                delay = self._should_retry(e, attempt, deadline)
+                if delay is None:
+                    raise
+                self.retries += 1
+                logger.warning(f"Transient LLM error ({type(e).__name__}: {str(e)}), retry {attempt + 1} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    async def stream(self, model: str, factory: Callable[[], AsyncIterator[str]]) -> AsyncGenerator[str, None]:
+        """
+        Run a streaming call
+
+        Retries and hedging only apply until the first delta has been produced;
+        an error after that point is raised to the caller.
+
+        Args:
+            model: Model name, used to keep latency statistics per model
+            factory: Function returning one upstream async iterator of deltas
+
+        Yields:
+            Deltas of the winning attempt
+        """
+        deadline = asyncio.get_running_loop().time() + self.deadline
+        _empty = object()
+
+        async def open_stream() -> Tuple[AsyncIterator[str], Any]:
+            iterator = factory().__aiter__()
+            try:
+                return iterator, await iterator.__anext__()
+            except StopAsyncIteration:
+                return iterator, _empty
+            except BaseException:
+                await iterator.aclose()
+                raise
+
+        def discard(opened: Tuple[AsyncIterator[str], Any]) -> None:
+            asyncio.create_task(opened[0].aclose())
+
+        attempt = 0
+        while True:
+            try:
+                iterator, first = await self._race(f"{model}:stream", open_stream, deadline, discard)
+                break
+            except Exception as e:
+                delay = self._should_retry(e, attempt, deadline)
+                if delay is None:
+                    raise
+                self.retries += 1
+                logger.warning(f"Transient LLM stream error ({type(e).__name__}: {str(e)}), retry {attempt + 1} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                attempt += 1
+
+        try:
+            if first is not _empty:
+                yield first
+            async for delta in iterator:
+                yield delta
+        finally:
+            await iterator.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        """Retry and hedging counters"""
+        return {
+            "retries": self.retries,
+            "hedge_enabled": self.hedge_enabled,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "deadline_exceeded": self.deadline_exceeded
+        }
+
+
+resilient_caller = ResilientCaller()
@@ -1,4 +1,4 @@
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, AsyncGenerator, Union
 from pydantic import BaseModel
 from agents.llm import LiteLLMWrapper
 from dotenv import load_dotenv
@@ -15,6 +15,15 @@ class SubProblem(BaseModel):
     description: str
     objective: str
     id: str
+    # 'similar_contexts': (metadata, content) pairs retrieved for this sub-problem
+    metadata: Optional[Dict[str, Any]] = None
+
+def format_documents(documents: List) -> str:
+    """Render retrieved (metadata, content) pairs for a prompt"""
+    return "".join(
+        f"\nFrom '{doc_metadata.get('title', 'Untitled')}' by {doc_metadata.get('authors', 'Unknown Authors')}:\n{content}\n"
+        for doc_metadata, content in documents
+    )
 
 class SolverRequest(BaseModel):
     """Data structure for solver request"""
@@ -68,7 +77,7 @@ class Solver(LiteLLMWrapper):
         Args:
             subProblem: Sub-problem object
             id: Optional identifier string
-            context: Optional context dictionary containing solution history
+            context: Optional context dictionary containing solution history and retrieved documents
         """
         base_prompt = f"""Please solve the following sub-problem:
 
@@ -91,15 +100,22 @@ Objective: {subProblem.objective}"""
                     base_prompt += f"\nTitle: {latest_solution.get('title', '')}"
                     base_prompt += f"\nProblem: {latest_solution.get('problem', '')}"
 
-                    solution_content = latest_solution.get('solution', '')
-                    if len(solution_content) > 1000:  # If the content is too long, only take the first 1000 characters
-                        solution_content = solution_content[:1000] + "..."
+                    # Stored nodes carry the first 1000 characters of their solution as solution_preview
+                    solution_content = latest_solution.get('solution_preview')
+                    if solution_content is None:
+                        solution_content = latest_solution.get('solution', '')
+                        if len(solution_content) > 1000:  # If the content is too long, only take the first 1000 characters
+                            solution_content = solution_content[:1000] + "..."
                     base_prompt += f"\nSolution Summary: {solution_content}"
 
-            if hasattr(subProblem, 'metadata') and subProblem.metadata and 'similar_contexts' in subProblem.metadata:
-                base_prompt += "\n\nRelevant research context (top 2 most similar documents):\n"
-                for doc in subProblem.metadata['similar_contexts'][:2]:
-                    base_prompt += f"\nDocument content: {doc}\n"
+            # (metadata, content) pairs retrieved for the round, see rag/retrieval.py
+            if context.get("relevantDocuments"):
+                base_prompt += "\n\nRelevant research context:\n"
+                base_prompt += format_documents(context["relevantDocuments"])
+
+        if subProblem.metadata and subProblem.metadata.get('similar_contexts'):
+            base_prompt += "\n\nResearch context for this sub-problem:\n"
+            base_prompt += format_documents(subProblem.metadata['similar_contexts'])
 
         base_prompt += "\n\nPlease provide a solution that builds upon the previous context while addressing the current problem. Focus on practical implementation details and ensure your answer is in the specified language."
         
@@ -126,7 +142,7 @@ Objective: {subProblem.objective}"""
                 request.context
             )
             
-            solution = self.generate(
+            solution = await self.agenerate(
                 prompt=user_prompt,
                 system_message=system_prompt,
                 max_tokens=2000,
@@ -152,6 +168,56 @@ Objective: {subProblem.objective}"""
                 subProblemId=request.subProblem.id
             )
 
+    async def solve_stream(self, request: SolverRequest) -> AsyncGenerator[Union[str, SolverResponse], None]:
+        """
+        Solve a single sub-problem while streaming the solution as it is generated
+        
+        Args:
+            request: Request object containing sub-problem details
+            
+        Yields:
+            Text deltas of the solution, followed by the final SolverResponse
+        """
+        chunks = []
+        try:
+            if request.metadata and isinstance(request.metadata, dict):
+                self.language = request.metadata.get("language", "English")
+            
+            system_prompt = self._get_system_prompt()
+            user_prompt = self._get_user_prompt(
+                request.subProblem, 
+                request.traceId or "",
+                request.context
+            )
+            
+            async for delta in self.astream(
+                prompt=user_prompt,
+                system_message=system_prompt,
+                max_tokens=2000,
+                stop=None
+            ):
+                chunks.append(delta)
+                yield delta
+            
+            yield SolverResponse(
+                success=True,
+                title=request.subProblem.title,
+                content="".join(chunks),
+                traceId=request.traceId,
+                subProblemId=request.subProblem.id
+            )
+            
+        except Exception as e:
+            error_msg = f"Failed to solve sub-problem: {str(e)}"
+            self.logger.error(error_msg)
+            yield SolverResponse(
+                success=False,
+                title=request.subProblem.title,
+                content=error_msg,
+                traceId=request.traceId,
+                subProblemId=request.subProblem.id
+            )
+
     async def solve(self, request: SolverRequest) -> SolverResponse:
         """
         Main entry point to solve the problem
@@ -59,7 +59,7 @@ async def chat(request: ChatRequest):
         )
 
         system_message = "When returning mathematical formulas, you need to add extra $$ symbols to wrap latex formulas"
-        response = llm.generate(
+        response = await llm.agenerate(
             prompt=request.prompt,
             system_message=system_message,
             max_tokens=request.max_tokens
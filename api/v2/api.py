@@ -6,22 +6,21 @@ import json
 import os
 from dotenv import load_dotenv
 from motor.motor_asyncio import AsyncIOMotorClient
-import uuid
-from bson.objectid import ObjectId
 
 from agents.breaker import AIBreaker, BreakerRequest
 from agents.solver import Solver, SolverRequest
 from core.round_history_steam import round_stream
 from agents.llm import LiteLLMWrapper
+from db.find_history import get_subtree, search_nodes
 
 load_dotenv()
 
 router = APIRouter()
 MODEL_NAME = os.getenv("MODEL_NAME")
 
-def get_db_client():
-    from db.database import get_client
-    return get_client()
+def get_repository():
+    from db.database import get_repository
+    return get_repository()
 
 class ChatRequest(BaseModel):
     prompt: str
@@ -50,41 +49,13 @@ async def set_priority(request: PriorityUpdateRequest):
         Updated node data
     """
     try:
-        client = get_db_client()
-        db = client['nodetree']
-        collection = db['nodes']
-        
-        # 处理 UUID 格式的 ID
         try:
-            if len(request.id) == 36:  # UUID 格式
-                hex_id = uuid.UUID(request.id).hex[:24]
-                object_id = ObjectId(hex_id)
-            else:  # 已经是 24 位的 hex 格式
-                object_id = ObjectId(request.id)
-        except Exception as e:
+            # Write-through: cached ancestry chains see the new priority
+            updated_node = await get_repository().set_priority(request.id, request.priority)
+        except ValueError as e:
             raise HTTPException(status_code=400, detail=f"Invalid ID format: {str(e)}")
-        
-        # 更新优先级
-        result = await collection.update_one(
-            {'_id': object_id},
-            {'$set': {'priority': request.priority}}
-        )
-        
-        if result.modified_count == 0:
-            # 检查文档是否存在
-            doc = await collection.find_one({'_id': object_id})
-            if not doc:
-                raise HTTPException(status_code=404, detail="Node not found")
-            # 如果文档存在但没有修改，可能是设置了相同的优先级
-        
-        # 获取更新后的节点
-        updated_node = await collection.find_one({'_id': object_id})
         if not updated_node:
-            raise HTTPException(status_code=404, detail="Node not found after update")
-        
-        # 确保返回正确的 ID 格式
-        updated_node['id'] = str(updated_node['_id'])
-        del updated_node['_id']
+            raise HTTPException(status_code=404, detail="Node not found")
         
         return {
             "success": True,
@@ -97,6 +68,62 @@ async def set_priority(request: PriorityUpdateRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/subtree/{node_id}")
+async def subtree(node_id: str, max_depth: Optional[int] = None, include_solution: bool = True):
+    """
+    Returns a node and all of its descendants in one read
+    
+    Args:
+        node_id: ID of the subtree root
+        max_depth: Levels returned below the node, all levels if omitted
+        include_solution: Whether full solutions are returned, or only their solution_preview
+        
+    Returns:
+        Flat list of nodes ordered by depth, linked through parent_id
+    """
+    if max_depth is not None and max_depth < 0:
+        raise HTTPException(status_code=400, detail="max_depth must not be negative")
+    try:
+        nodes = await get_subtree(node_id, get_repository(), max_depth, include_solution)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if nodes is None:
+        raise HTTPException(status_code=404, detail="Node not found")
+    
+    return {
+        "success": True,
+        "node_id": nodes[0]['id'],
+        "nodes": nodes
+    }
+
+@router.get("/search")
+async def search(q: str, page: int = 1, page_size: int = 20):
+    """
+    Full-text search over saved nodes, to find an existing answer before asking again
+    
+    Args:
+        q: Search terms; any of them may match, -term excludes nodes containing term
+        page: 1-based page number
+        page_size: Results per page
+        
+    Returns:
+        Matching nodes ranked by relevance, each with its score and a highlighted snippet
+    """
+    try:
+        found = await search_nodes(q, get_repository(), page, page_size)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    return {
+        "success": True,
+        "query": q,
+        **found
+    }
+
 @router.post("/chat")
 async def chat(request: ChatRequest):
     try:
@@ -106,7 +133,7 @@ async def chat(request: ChatRequest):
         )
 
         system_message = "When returning mathematical formulas, you need to add extra $$ symbols to wrap latex formulas"
-        response = llm.generate(
+        response = await llm.agenerate(
             prompt=request.prompt,
             system_message=system_message,
             max_tokens=request.max_tokens
@@ -128,11 +155,11 @@ async def round_context_endpoint(request: BreakerRequest):
         StreamingResponse containing solution streams
     """
     try:
-        client = get_db_client()
+        repository = get_repository()
         return StreamingResponse(
             stream_context_events(
                 problem=request.originalInput,
-                client=client,
+                repository=repository,
                 follow_up_question=request.followUpQuestion,
                 metadata=request.metadata,
                 parent_id=request.metadata.get('parent_id') if request.metadata else None
@@ -145,7 +172,7 @@ async def round_context_endpoint(request: BreakerRequest):
 
 async def stream_context_events(
     problem: str,
-    client,
+    repository,
     follow_up_question: Optional[str] = None,
     metadata: Optional[Dict[str, Any]] = None,
     parent_id: Optional[str] = None
@@ -156,7 +183,7 @@ async def stream_context_events(
     try:
         async for event in round_stream(
             problem=problem,
-            client=client,
+            repository=repository,
             follow_up_question=follow_up_question,
             metadata=metadata,
             parent_id=parent_id
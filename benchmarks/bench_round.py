@@ -0,0 +1,136 @@
+# Load test of the round pipeline against the offline fake LLM backend
+#
+#   python -m benchmarks.bench_round --profile realistic --rounds 20 --concurrency 10
+#   python -m benchmarks.bench_round --store sqlite --rounds 20   # rounds with history, persisted locally
+#
+# No network or API keys are needed; every completion is served by agents/fake_llm.py.
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark round_stream with the fake LLM backend")
+    parser.add_argument("--profile", default="fast", help="fake model profile (instant, fast, realistic, slow, flaky)")
+    parser.add_argument("--rounds", type=int, default=20, help="number of rounds to run")
+    parser.add_argument("--concurrency", type=int, default=10, help="rounds running at the same time")
+    parser.add_argument("--distinct", type=int, default=0, help="number of distinct questions (0 = every round is unique)")
+    parser.add_argument(
+        "--store",
+        choices=["none", "memory", "sqlite"],
+        default="none",
+        help="persist rounds in this node store, each round continuing from a node of an earlier one (none = no persistence)"
+    )
+    return parser.parse_args()
+
+
+def percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+async def run_round(round_stream, question: str, **kwargs) -> dict:
+    started = time.perf_counter()
+    first_subproblem = first_delta = persisted = None
+    nodes = errors = 0
+    node_ids = []
+    async for event in round_stream(problem=question, metadata={"language": "English"}, **kwargs):
+        elapsed = time.perf_counter() - started
+        if event["event"] == "subproblem" and first_subproblem is None:
+            first_subproblem = elapsed
+        elif event["event"] == "solver_delta" and first_delta is None:
+            first_delta = elapsed
+        elif event["event"] == "solver_output":
+            nodes += 1
+            node_ids.append(event["data"]["id"])
+        elif event["event"] == "solver_error":
+            errors += 1
+        elif event["event"] == "round_persisted":
+            persisted = elapsed
+    return {
+        "total": time.perf_counter() - started,
+        "first_subproblem": first_subproblem,
+        "first_delta": first_delta,
+        "persisted": persisted,
+        "nodes": nodes,
+        "node_ids": node_ids,
+        "errors": errors
+    }
+
+
+async def main(args: argparse.Namespace) -> dict:
+    from agents.llm_cache import completion_cache
+    from agents.llm_coalesce import single_flight
+    from agents.llm_ratelimit import rate_limiter
+    from agents.llm_retry import resilient_caller
+    from db.node_cache import node_cache
+
+    repository = None
+    if args.store == "none":
+        from core.round_stream import round_stream
+    else:
+        from core.round_history_steam import round_stream
+        from db.database import create_repository
+        repository = create_repository(args.store)
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    # Nodes of finished rounds; later rounds follow up on one of them, loading its history
+    parents = []
+
+    async def limited(i: int) -> dict:
+        question_id = i % args.distinct if args.distinct else i
+        async with semaphore:
+            question = f"Benchmark question #{question_id}: design a scalable tree explorer"
+            if repository is None:
+                return await run_round(round_stream, question)
+            result = await run_round(round_stream, question, repository=repository, parent_id=parents[-1] if parents else None)
+            parents.extend(result["node_ids"])
+            return result
+
+    started = time.perf_counter()
+    try:
+        results = await asyncio.gather(*[limited(i) for i in range(args.rounds)])
+    finally:
+        if repository is not None:
+            await repository.close()
+    wall = time.perf_counter() - started
+
+    def summary(key: str) -> dict:
+        values = [r[key] for r in results if r[key] is not None]
+        return {
+            "p50": statistics.median(values) if values else 0.0,
+            "p95": percentile(values, 0.95),
+            "max": max(values) if values else 0.0
+        }
+
+    return {
+        "profile": args.profile,
+        "rounds": args.rounds,
+        "concurrency": args.concurrency,
+        "wall_seconds": wall,
+        "rounds_per_second": args.rounds / wall if wall else 0.0,
+        "round_latency": summary("total"),
+        "time_to_first_subproblem": summary("first_subproblem"),
+        "time_to_first_delta": summary("first_delta"),
+        "time_to_persisted": summary("persisted"),
+        "nodes": sum(r["nodes"] for r in results),
+        "solver_errors": sum(r["errors"] for r in results),
+        "store": args.store,
+        "node_cache": node_cache.stats(),
+        "llm": {
+            "cache": completion_cache.stats(),
+            "coalescing": single_flight.stats(),
+            "rate_limits": rate_limiter.stats(),
+            "resilience": resilient_caller.stats()
+        }
+    }
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    # Agents read MODEL_NAME when they are imported, so select the fake model first
+    os.environ["MODEL_NAME"] = f"fake/{args.profile}"
+    print(json.dumps(asyncio.run(main(args)), indent=2))
@@ -0,0 +1,160 @@
+# Latency of the node store backends on the operations a round performs
+#
+#   python -m benchmarks.bench_store --stores memory,sqlite --trees 20 --depth 8 --fanout 4
+#   python -m benchmarks.bench_store --stores memory,sqlite,mongo   # nodetree.bench_nodes at MONGODB_URL
+#
+# Every store gets the same synthetic trees: one round per level, each saving
+# `fanout` children of a node of the level above with one save_many. The node
+# cache is disabled so every read reaches the backend.
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the node store backends")
+    parser.add_argument("--stores", default="memory,sqlite", help="comma-separated stores (memory, sqlite, mongo)")
+    parser.add_argument("--trees", type=int, default=20, help="number of trees")
+    parser.add_argument("--depth", type=int, default=8, help="levels below each root")
+    parser.add_argument("--fanout", type=int, default=4, help="children saved per round")
+    parser.add_argument("--solution-bytes", type=int, default=4000, help="size of every solution body")
+    parser.add_argument("--reads", type=int, default=500, help="reads timed per read operation")
+    return parser.parse_args()
+
+
+def percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+def summary(samples) -> dict:
+    return {
+        "count": len(samples),
+        "p50_ms": statistics.median(samples) * 1000 if samples else 0.0,
+        "p95_ms": percentile(samples, 0.95) * 1000,
+        "max_ms": max(samples) * 1000 if samples else 0.0
+    }
+
+
+def make_node(parent, depth: int, solution_bytes: int, created_at: datetime) -> dict:
+    node_id = str(uuid.uuid4())
+    ancestors = parent["ancestors"] + [parent["id"]] if parent else []
+    return {
+        "id": node_id,
+        "title": f"Node {node_id[:8]}",
+        "description": "Synthetic benchmark node",
+        "objective": "Measure store latency",
+        "problem": "Benchmark question",
+        "solution": "x" * solution_bytes,
+        "priority": random.randint(0, 3),
+        "parent_id": parent["id"] if parent else None,
+        "ancestors": ancestors,
+        "root_id": ancestors[0] if ancestors else node_id,
+        "depth": depth,
+        "created_at": created_at.isoformat()
+    }
+
+
+async def open_store(store: str, directory: str):
+    if store == "mongo":
+        from db.database import create_client
+        from db.indexes import ensure_indexes
+        from db.repository import MongoNodeRepository
+        client = create_client()
+        # A scratch collection with the production indexes, dropped afterwards
+        repository = MongoNodeRepository(client, collection="bench_nodes")
+        await repository.collection.drop()
+        await ensure_indexes(repository.collection)
+
+        async def close():
+            await repository.collection.drop()
+            client.close()
+        return repository, close
+    if store == "sqlite":
+        from db.sqlite_store import SQLiteNodeRepository
+        repository = SQLiteNodeRepository(os.path.join(directory, "bench.db"))
+    else:
+        from db.memory_store import MemoryNodeRepository
+        repository = MemoryNodeRepository()
+    return repository, repository.close
+
+
+async def bench_store(store: str, args: argparse.Namespace, directory: str) -> dict:
+    from db.find_history import get_lineage, get_solution_history, get_subtree, save_solution, search_nodes
+
+    repository, close = await open_store(store, directory)
+    rng_state = random.getstate()
+    random.seed(42)
+    created_at = datetime(2024, 1, 1)
+    samples = {name: [] for name in ("save_many", "save_solution", "lineage", "history", "subtree", "set_priority", "search")}
+    roots, leaves = [], []
+    try:
+        for _ in range(args.trees):
+            root = make_node(None, 0, args.solution_bytes, created_at)
+            started = time.perf_counter()
+            await save_solution(dict(root), repository)
+            samples["save_solution"].append(time.perf_counter() - started)
+            roots.append(root)
+            parent = root
+            for depth in range(1, args.depth + 1):
+                created_at += timedelta(seconds=1)
+                children = [make_node(parent, depth, args.solution_bytes, created_at) for _ in range(args.fanout)]
+                started = time.perf_counter()
+                await repository.save_many(children)
+                samples["save_many"].append(time.perf_counter() - started)
+                parent = random.choice(children)
+            leaves.append(parent)
+
+        for _ in range(args.reads):
+            leaf = random.choice(leaves)
+            started = time.perf_counter()
+            await get_lineage(leaf["id"], repository)
+            samples["lineage"].append(time.perf_counter() - started)
+            started = time.perf_counter()
+            await get_solution_history(leaf["id"], repository)
+            samples["history"].append(time.perf_counter() - started)
+            started = time.perf_counter()
+            await repository.set_priority(leaf["id"], random.randint(0, 3))
+            samples["set_priority"].append(time.perf_counter() - started)
+            started = time.perf_counter()
+            # Titles carry the start of the node id, a term that matches exactly one node
+            await search_nodes(f"benchmark {leaf['id'][:8]}", repository)
+            samples["search"].append(time.perf_counter() - started)
+        for _ in range(max(1, args.reads // 10)):
+            started = time.perf_counter()
+            await get_subtree(random.choice(roots)["id"], repository, include_solution=False)
+            samples["subtree"].append(time.perf_counter() - started)
+    finally:
+        await close()
+        random.setstate(rng_state)
+
+    return {name: summary(values) for name, values in samples.items()}
+
+
+async def main(args: argparse.Namespace) -> dict:
+    from db.node_cache import node_cache
+
+    node_cache.enabled = False
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for store in [store.strip() for store in args.stores.split(",") if store.strip()]:
+            results[store] = await bench_store(store, args, directory)
+    return {
+        "trees": args.trees,
+        "depth": args.depth,
+        "fanout": args.fanout,
+        "nodes": args.trees * (1 + args.depth * args.fanout),
+        "solution_bytes": args.solution_bytes,
+        "stores": results
+    }
+
+
+if __name__ == "__main__":
+    print(json.dumps(asyncio.run(main(parse_args())), indent=2))
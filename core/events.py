@@ -0,0 +1,118 @@
+from typing import Dict, Any, List, Optional
+
+
+def node_skeleton(sub_problem: Dict[str, Any]) -> Dict[str, Any]:
+    """Fields of a sub-problem the frontend needs to draw its node before it is solved"""
+    return {
+        'id': sub_problem.get('id'),
+        'title': sub_problem.get('title'),
+        'objective': sub_problem.get('objective')
+    }
+
+
+def subproblem_event(sub_problem: Dict[str, Any], parent_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Build the subproblem event announcing a single child node as soon as the breaker produces it
+
+    Args:
+        sub_problem (Dict[str, Any]): Sub-problem that is about to be solved
+        parent_id (Optional[str]): Id of the node the new child hangs under
+
+    Returns:
+        Dict[str, Any]: subproblem event with the skeleton of the child node
+    """
+    return {
+        "event": "subproblem",
+        "data": dict(node_skeleton(sub_problem), parent_id=parent_id)
+    }
+
+
+def breakdown_event(
+    sub_problems: List[Dict[str, Any]],
+    breakdown: Optional[Dict[str, Any]] = None,
+    parent_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Build the breakdown event announcing the child nodes of a round before they are solved
+
+    Args:
+        sub_problems (List[Dict[str, Any]]): Sub-problems that will be solved in this round
+        breakdown (Optional[Dict[str, Any]]): Breaker result the sub-problems come from
+        parent_id (Optional[str]): Id of the node the new children hang under
+
+    Returns:
+        Dict[str, Any]: breakdown event with the skeleton of every child node, and
+        the 'error' of the breaker when it failed after some sub-problems were scheduled
+    """
+    data = (breakdown or {}).get('data', {})
+    event = {
+        "event": "breakdown",
+        "data": {
+            'parent_id': parent_id,
+            'problem': data.get('problem'),
+            'mainObjective': data.get('mainObjective'),
+            'subProblems': [node_skeleton(sub_problem) for sub_problem in sub_problems]
+        }
+    }
+    if breakdown is not None and not breakdown.get('success', True):
+        event["data"]['error'] = data.get('error')
+    return event
+
+
+def solver_error_event(
+    node_id: str,
+    sub_problem: Dict[str, Any],
+    error: str,
+    parent_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Build the solver_error event reporting a node whose solver failed after all retries
+
+    Args:
+        node_id (str): Id of the node that could not be solved
+        sub_problem (Dict[str, Any]): Sub-problem the node was created for
+        error (str): Error message returned by the solver
+        parent_id (Optional[str]): Id of the node the failed child hangs under
+
+    Returns:
+        Dict[str, Any]: solver_error event
+    """
+    return {
+        "event": "solver_error",
+        "data": {
+            'id': node_id,
+            'title': sub_problem.get('title'),
+            'parent_id': parent_id,
+            'error': error
+        }
+    }
+
+
+def round_persisted_event(
+    persisted: List[str],
+    failed: Optional[List[str]] = None,
+    parent_id: Optional[str] = None,
+    error: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Build the round_persisted event confirming which nodes of a round reached the database
+
+    Args:
+        persisted (List[str]): Ids of the nodes that were written
+        failed (Optional[List[str]]): Ids of the nodes whose write failed
+        parent_id (Optional[str]): Id of the node the round's children hang under
+        error (Optional[str]): Write error, if any
+
+    Returns:
+        Dict[str, Any]: round_persisted event
+    """
+    return {
+        "event": "round_persisted",
+        "data": {
+            'parent_id': parent_id,
+            'success': error is None,
+            'persisted': persisted,
+            'failed': failed or [],
+            'error': error
+        }
+    }
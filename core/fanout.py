@@ -0,0 +1,104 @@
+from typing import Any, AsyncGenerator, AsyncIterator, Dict, Set
+import asyncio
+import logging
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of solver streams allowed to run at the same time within one round
+MAX_CONCURRENT_SOLVERS = int(os.getenv("MAX_CONCURRENT_SOLVERS", "3"))
+
+_DONE = object()
+
+
+class FanOut:
+    """
+    Runs several event streams concurrently under a concurrency cap and merges
+    their events into a single stream in completion order
+    """
+
+    def __init__(self, limit: int = MAX_CONCURRENT_SOLVERS):
+        """
+        Initialize the fan-out
+
+        Args:
+            limit: Maximum number of streams consumed at the same time
+        """
+        self._semaphore = asyncio.Semaphore(max(1, limit))
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._tasks: Set[asyncio.Task] = set()
+        self._pending = 0
+        self._closed = False
+
+    def submit(self, stream: AsyncIterator[Dict[str, Any]], limited: bool = True) -> None:
+        """
+        Schedule an event stream; it starts as soon as a slot is free
+
+        Args:
+            stream: Async iterator yielding event dictionaries
+            limited: Whether the stream counts against the concurrency cap
+        """
+        if self._closed:
+            raise RuntimeError("Cannot submit to a closed FanOut")
+        self._pending += 1
+        task = asyncio.create_task(self._run(stream, limited))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def publish(self, event: Dict[str, Any]) -> None:
+        """
+        Emit a single event directly into the merged stream
+
+        Args:
+            event: Event dictionary
+        """
+        self._queue.put_nowait(event)
+
+    def close(self) -> None:
+        """Signal that no more streams will be submitted"""
+        self._closed = True
+        self._queue.put_nowait(None)
+
+    async def _run(self, stream: AsyncIterator[Dict[str, Any]], limited: bool) -> None:
+        try:
+            if limited:
+                async with self._semaphore:
+                    await self._drain(stream)
+            else:
+                await self._drain(stream)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Fan-out stream failed: {str(e)}")
+            self._queue.put_nowait(e)
+        finally:
+            self._queue.put_nowait(_DONE)
+
+    async def _drain(self, stream: AsyncIterator[Dict[str, Any]]) -> None:
+        async for event in stream:
+            self._queue.put_nowait(event)
+
+    async def events(self) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        Yield events from all submitted streams as they are produced
+
+        Raises:
+            Exception: The first error raised by any submitted stream
+        """
+        try:
+            while not (self._closed and self._pending == 0):
+                item = await self._queue.get()
+                if item is None:
+                    continue
+                if item is _DONE:
+                    self._pending -= 1
+                    continue
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            for task in list(self._tasks):
+                task.cancel()
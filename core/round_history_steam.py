@@ -1,16 +1,19 @@
 from typing import Dict, Any, Optional, AsyncGenerator, List
 import asyncio
 from agents.breaker import AIBreaker, BreakerRequest
-from agents.solver import Solver, SolverRequest, SubProblem
+from agents.solver import Solver, SolverRequest, SolverResponse, SubProblem
+from core.events import breakdown_event, round_persisted_event, subproblem_event, solver_error_event
+from core.fanout import FanOut, MAX_CONCURRENT_SOLVERS
 from datetime import datetime
-from db.database import get_client  # Changed to directly import from database module
+from db.database import NODE_STORE, close_store, connect_store, get_repository
 import logging
-from db.find_history import get_solution_history, save_solution
+from db.find_history import get_lineage, get_solution_history, save_solution
+from db.repository import NodeRepository
+from db.round_writer import RoundWriter
+from rag.retrieval import Documents, retriever
 import uuid
 import json
 
-from bson import ObjectId 
-
 logger = logging.getLogger(__name__)
 
 
@@ -21,22 +24,160 @@ def serialize_solution(solution: Dict[str, Any]) -> Dict[str, Any]:
     # Directly return the original solution without serialization
     return solution
 
+async def solve_node(
+    sub_problem: Dict[str, Any],
+    problem: str,
+    repository: NodeRepository,
+    follow_up_question: Optional[str] = None,
+    metadata: Optional[Dict[str, Any]] = None,
+    parent_id: Optional[str] = None,
+    solution_history: Optional[List[Dict[str, Any]]] = None,
+    stream_tokens: bool = True,
+    lineage: Optional[Dict[str, Any]] = None,
+    writer: Optional[RoundWriter] = None,
+    documents: Optional["asyncio.Future[Documents]"] = None,
+    similar_contexts: Optional["asyncio.Future[Documents]"] = None
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """
+    Solve a single sub-problem, save it and yield its solver events
+
+    The node reuses the sub-problem id, so solver_delta events and the final
+    solver_output event for the same node share one id. lineage holds the
+    materialized path fields shared by every child of parent_id. With a writer
+    the node is buffered for a write-behind flush and emitted right away;
+    otherwise it is saved before solver_output is emitted. documents is the
+    round's retrieval, started before the breaker; its documents are added to
+    the solver prompt. similar_contexts resolves to the documents retrieved for
+    this sub-problem once the breakdown is complete.
+    """
+    # Normally done long before the breaker has streamed a sub-problem
+    relevant_documents = await documents if documents is not None else []
+    sub_problem_metadata = {'similar_contexts': await similar_contexts} if similar_contexts is not None else None
+
+    solver = Solver(
+        language=metadata.get('language', 'English')
+    )
+    
+    # Create solver request
+    solver_request = SolverRequest(
+        subProblem=SubProblem(
+            title=sub_problem.get('title', ''),
+            description=sub_problem.get('description', ''),
+            objective=sub_problem.get('objective', ''),
+            id=sub_problem.get('id', ''),
+            language=metadata.get('language', 'English'),
+            metadata=sub_problem_metadata
+        ),
+        metadata=metadata,
+        context={
+            "originalProblem": problem,
+            "solutionHistory": solution_history or [],
+            "followUpQuestion": follow_up_question,
+            "relevantDocuments": relevant_documents
+        }
+    )
+    #with AI generated output for solver_request
+    # Get the solution, forwarding deltas tagged with the node id while it is generated
+    node_id = sub_problem.get('id') or str(uuid.uuid4())
+    if stream_tokens:
+        solution = None
+        async for item in solver.solve_stream(solver_request):
+            if isinstance(item, SolverResponse):
+                solution = item
+            else:
+                yield {
+                    "event": "solver_delta",
+                    "data": {'id': node_id, 'delta': item}
+                }
+    else:
+        solution = await solver.solve(solver_request)
+
+    if not solution.success:
+        # Failed nodes are reported to the client but never persisted
+        yield solver_error_event(node_id, sub_problem, solution.content, parent_id)
+        return
+    
+    # Create the current solution
+    current_solution = {
+        'title': sub_problem.get('title'),
+        'description': sub_problem.get('description'),
+        'objective': sub_problem.get('objective'),
+        'solution': solution.content,
+        'problem': problem,
+        'follow_up_question': follow_up_question,
+        'created_at': datetime.utcnow().isoformat(),
+        'parent_id': parent_id,
+        'metadata': metadata,
+        'id': node_id,
+        'priority': 0
+    }
+    if lineage is not None:
+        current_solution.update(lineage)
+    
+    if writer is not None:
+        yield {
+            "event": "solver_output",
+            "data": writer.add(current_solution)
+        }
+        return
+
+    # Save the solution
+    saved_id = await save_solution(current_solution, repository)
+    if saved_id:
+        # Directly use the original dictionary without any conversion
+        yield {
+            "event": "solver_output",
+            "data": dict(current_solution)
+        }
+
 #with AI generated output for streaming
 async def round_stream(
     problem: str,
-    client,  # MongoDB client instance
+    repository: NodeRepository,
     follow_up_question: Optional[str] = None,
     metadata: Optional[Dict[str, Any]] = None,
-    parent_id: Optional[str] = None
+    parent_id: Optional[str] = None,
+    max_concurrent_solvers: int = MAX_CONCURRENT_SOLVERS,
+    stream_tokens: bool = True,
+    retrieval_k: int = 0,
+    subproblem_retrieval_k: int = 0
 ) -> AsyncGenerator[Dict[str, Any], None]:
     """
     Stream processing function for generating solutions
+
+    The breaker response is parsed while it streams: every sub-problem is announced
+    with a subproblem event and handed to the solvers as soon as it is complete, and
+    a breakdown event with the skeleton of all child nodes follows once the breaker
+    has finished. Sub-problems are solved concurrently (at most
+    max_concurrent_solvers at a time) and each solver_output event is emitted as
+    soon as its node is solved. With stream_tokens enabled, solver_delta events
+    carry the text as it is generated.
+
+    Nodes are persisted write-behind: they are buffered while the round runs and
+    written with one bulk write at the end, confirmed by a round_persisted event.
+
+    With retrieval_k > 0 that many research documents similar to the problem are
+    retrieved in the background (see rag/retrieval.py), alongside the history
+    reads and the breaker, and handed to every solver.
+
+    With subproblem_retrieval_k > 0 that many documents are retrieved for each
+    sub-problem, for all of them in one batch (one embedding call, one vector
+    query) once the breakdown is complete. Solvers then wait for the breaker to
+    finish instead of starting on the first streamed sub-problem: time to the
+    first solver delta grows by the rest of the breakdown plus one retrieval,
+    in exchange for context specific to every node.
     """
+    writer = RoundWriter(repository)
+    documents = retriever.start(problem, retrieval_k) if retrieval_k > 0 else None
     try:
-        # Retrieve history records
+        # Retrieve history records, and the materialized path shared by every node of this round
         solution_history = []
+        lineage = {'ancestors': [], 'root_id': None, 'depth': 0}
         if parent_id:
-            solution_history = await get_solution_history(parent_id, client)
+            solution_history, lineage = await asyncio.gather(
+                get_solution_history(parent_id, repository),
+                get_lineage(parent_id, repository)
+            )
             # No longer need to serialize history records
             # solution_history = [serialize_solution(sol) for sol in solution_history]
         
@@ -48,73 +189,75 @@ async def round_stream(
             context={"solutionHistory": solution_history}
         )
 
-        breakdown = await breaker.process_request(breaker_request)
-        
-        # Get the list of sub-problems
-        sub_problems = breakdown.get('data', {}).get('subProblems', [])
-        if not sub_problems:
-            # If there are no sub-problems, create a default sub-problem
-            sub_problems = [{
-                'title': 'Solution',
-                'description': problem,
-                'objective': follow_up_question or 'Provide a complete solution',
-                'id': str(uuid.uuid4())
-            }]
-
-        # Process each sub-problem
-        for sub_problem in sub_problems:
-            solver = Solver(
-                language=metadata.get('language', 'English')
-            )
-            
-            # Create solver request
-            solver_request = SolverRequest(
-                subProblem=SubProblem(
-                    title=sub_problem.get('title', ''),
-                    description=sub_problem.get('description', ''),
-                    objective=sub_problem.get('objective', ''),
-                    id=sub_problem.get('id', ''),
-                    language=metadata.get('language', 'English')
-                ),
+        fan_out = FanOut(limit=max_concurrent_solvers)
+        sub_problems = []
+        # Per sub-problem, the future of its similar contexts
+        contexts: List[asyncio.Future] = []
+
+        def schedule(sub_problem: Dict[str, Any]) -> None:
+            # Start solving each sub-problem as soon as the breaker has streamed it
+            sub_problems.append(sub_problem)
+            if subproblem_retrieval_k > 0:
+                contexts.append(asyncio.get_running_loop().create_future())
+            fan_out.publish(subproblem_event(sub_problem, parent_id))
+            fan_out.submit(solve_node(
+                sub_problem=sub_problem,
+                problem=problem,
+                repository=repository,
+                follow_up_question=follow_up_question,
                 metadata=metadata,
-                context={
-                    "originalProblem": problem,
-                    "solutionHistory": solution_history,
-                    "followUpQuestion": follow_up_question
-                }
-            )
-            #with AI generated output for solver_request
-            # Get the solution
-            solution = await solver.solve(solver_request)
-            
-            # Create the current solution
-            current_solution = {
-                'title': sub_problem.get('title'),
-                'description': sub_problem.get('description'),
-                'objective': sub_problem.get('objective'),
-                'solution': solution.content,
-                'problem': problem,
-                'follow_up_question': follow_up_question,
-                'created_at': datetime.utcnow().isoformat(),
-                'parent_id': parent_id,
-                'metadata': metadata,
-                '_id': str(uuid.uuid4()),
-                'priority': 0
-            }
-            
-            # Save the solution
-            saved_id = await save_solution(current_solution, client)
-            if saved_id:
-                # Ensure ObjectId is converted to string
-                current_solution['id'] = str(saved_id) if isinstance(saved_id, ObjectId) else str(saved_id)
-                current_solution['_id'] = str(current_solution['_id'])
-                
-                # Directly use the original dictionary without any conversion
-                data = {
-                    "event": "solver_output",
-                    "data": dict(current_solution)
-                }
-                yield data
+                parent_id=parent_id,
+                solution_history=solution_history,
+                stream_tokens=stream_tokens,
+                lineage=lineage,
+                writer=writer,
+                documents=documents,
+                similar_contexts=contexts[-1] if subproblem_retrieval_k > 0 else None
+            ))
+
+        async def break_down() -> AsyncGenerator[Dict[str, Any], None]:
+            try:
+                breakdown = await breaker.stream_process_request(breaker_request, on_subproblem=schedule)
+                if not sub_problems:
+                    # If there are no sub-problems, create a default sub-problem
+                    schedule({
+                        'title': 'Solution',
+                        'description': problem,
+                        'objective': follow_up_question or 'Provide a complete solution',
+                        'id': str(uuid.uuid4())
+                    })
+                # Announce the complete set of child nodes once the breaker has finished
+                yield breakdown_event(sub_problems, breakdown, parent_id)
+                if contexts:
+                    try:
+                        found = await retriever.search_many(
+                            [f"{sub_problem.get('title', '')}: {sub_problem.get('description', '')}" for sub_problem in sub_problems],
+                            subproblem_retrieval_k
+                        )
+                    except Exception as e:
+                        # Similar contexts are optional; the finally below lets the solvers go ahead without them
+                        logger.warning(f"Error retrieving sub-problem contexts: {str(e)}")
+                    else:
+                        for context, similar in zip(contexts, found):
+                            context.set_result(similar)
+            finally:
+                # Solvers waiting for contexts go ahead without them if the breakdown failed
+                for context in contexts:
+                    if not context.done():
+                        context.set_result([])
+                fan_out.close()
+
+        # The breaker runs alongside the solvers it schedules; events arrive in completion order
+        fan_out.submit(break_down(), limited=False)
+        async for event in fan_out.events():
+            yield event
+
+        # Every node has been streamed; confirm durability once the round is done
+        try:
+            persisted = await writer.flush()
+            yield round_persisted_event(persisted, parent_id=parent_id)
+        except Exception as e:
+            yield round_persisted_event(writer.persisted, writer.failed, parent_id, str(e))
             
     except Exception as e:
         logger.error(f"Error in round stream: {str(e)}")
@@ -127,42 +270,48 @@ async def round_stream(
             "event": "error",
             "data": error_data
         }
+    finally:
+        if documents is not None and not documents.done():
+            documents.cancel()
+        if writer.pending:
+            # Nodes already streamed are kept even if the round fails or the client disconnects
+            try:
+                await asyncio.shield(writer.flush())
+            except Exception as e:
+                logger.error(f"Error persisting round after it ended: {str(e)}")
 
 if __name__ == "__main__":
     async def main():
-        client = None
+        repository = None
         try:
             # Set log level
             logging.basicConfig(level=logging.INFO)
             
-            # Initialize database connection
-            await connect_to_mongo()
-            client = get_client()
-            
-            # Validate database connection
-            db = client['nodetree']
-            collections = await db.list_collection_names()
-            print(f"Available collections: {collections}")
+            # Initialize the node store selected by NODE_STORE
+            await connect_store()
+            repository = get_repository()
+            print(f"Node store: {NODE_STORE}")
             
             # First call - Create the initial node
             print("\n=== Creating the initial node: Basic To-Do App ===")
             first_id = None
             async for event in round_stream(
                 problem="Create a simple to-do app",
-                client=client,
+                repository=repository,
                 metadata={"language": "English"}
             ):
                 print(f"\nEvent type: {event['event']}")
                 print("Data:", event['data'])
                 print("-" * 80)
-                first_id = event['data']['id']
+                if event['event'] == 'solver_output':
+                    first_id = event['data']['id']
 
             # Second call - Add user authentication
             print("\n=== Adding user authentication ===")
             second_id = None
             async for event in round_stream(
                 problem="How to add user authentication?",
-                client=client,
+                repository=repository,
                 follow_up_question="What technology stack is needed?",
                 metadata={"language": "English"},
                 parent_id=first_id
@@ -170,14 +319,15 @@ if __name__ == "__main__":
                 print(f"\nEvent type: {event['event']}")
                 print("Data:", event['data'])
                 print("-" * 80)
-                second_id = event['data']['id']
+                if event['event'] == 'solver_output':
+                    second_id = event['data']['id']
 
             # Third call - Add task categorization
             print("\n=== Adding task categorization ===")
             third_id = None
             async for event in round_stream(
                 problem="How to implement task categorization?",
-                client=client,
+                repository=repository,
                 follow_up_question="How to design the database model?",
                 metadata={"language": "English"},
                 parent_id=second_id
@@ -185,13 +335,14 @@ if __name__ == "__main__":
                 print(f"\nEvent type: {event['event']}")
                 print("Data:", event['data'])
                 print("-" * 80)
-                third_id = event['data']['id']
+                if event['event'] == 'solver_output':
+                    third_id = event['data']['id']
 
             # Fourth call - Add task priority
             print("\n=== Adding task priority ===")
             async for event in round_stream(
                 problem="How to add task priority?",
-                client=client,
+                repository=repository,
                 follow_up_question="How to display different priorities on the interface?",
                 metadata={"language": "English"},
                 parent_id=third_id
@@ -202,7 +353,7 @@ if __name__ == "__main__":
 
 
             print("\n=== Displaying the complete solution history chain ===")
-            history = await get_solution_history(third_id, client)
+            history = await get_solution_history(third_id, repository)
             print("\nComplete history data structure:")
             for idx, item in enumerate(history, 1):
                 print(f"\nSolution #{idx}:")
@@ -236,7 +387,7 @@ if __name__ == "__main__":
             print(f"An error occurred: {e}")
             raise
         finally:
-            if client:
-                await close_mongo_connection()
+            if repository:
+                await close_store()
 
     asyncio.run(main())
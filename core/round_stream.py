@@ -1,14 +1,77 @@
 from typing import Dict, Any, Optional, AsyncGenerator
 import asyncio
 from agents.breaker import AIBreaker, BreakerRequest
-from agents.solver import Solver, SolverRequest, SubProblem
+from agents.solver import Solver, SolverRequest, SolverResponse, SubProblem
+from core.events import breakdown_event, subproblem_event, solver_error_event
+from core.fanout import FanOut, MAX_CONCURRENT_SOLVERS
 
 MAX_NODES = 3
+
+async def solve_node(
+    sub_problem: Dict[str, Any],
+    language: str,
+    metadata: Optional[Dict[str, Any]] = None,
+    stream_tokens: bool = True
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """
+    Solve a single sub-problem and yield its solver events
+    
+    Args:
+        sub_problem (Dict[str, Any]): Sub-problem produced by the breaker
+        language (str): Response language
+        metadata (Optional[Dict[str, Any]]): Solver metadata
+        stream_tokens (bool): Emit solver_delta events while the solution is generated
+    
+    Yields:
+        Dict[str, Any]: solver_delta events tagged with the sub-problem id, then its solver_output
+        event (or a solver_error event if the solver failed)
+    """
+    solver = Solver(language=language)
+    solver_request = SolverRequest(
+        subProblem=SubProblem(
+            title=sub_problem.get('title', ''),
+            description=sub_problem.get('description', ''),
+            objective=sub_problem.get('objective', ''),
+            id=sub_problem.get('id', ''),
+            language=language
+        ),
+        metadata=metadata
+    )
+    if stream_tokens:
+        solution = None
+        async for item in solver.solve_stream(solver_request):
+            if isinstance(item, SolverResponse):
+                solution = item
+            else:
+                yield {
+                    "event": "solver_delta",
+                    "data": {'id': sub_problem.get('id'), 'delta': item}
+                }
+    else:
+        solution = await solver.solve(solver_request)
+
+    if not solution.success:
+        yield solver_error_event(sub_problem.get('id'), sub_problem, solution.content)
+        return
+    
+    yield {
+        "event": "solver_output",
+        "data": {
+            'id': sub_problem.get('id'),
+            'title': sub_problem.get('title'),
+            'description': sub_problem.get('description'),
+            'objective': sub_problem.get('objective'),
+            'solution': solution.content
+        }
+    }
+
 # schema design with AI help
 async def round_stream(
     problem: str,
     follow_up_question: Optional[str] = None,
-    metadata: Optional[Dict[str, Any]] = None
+    metadata: Optional[Dict[str, Any]] = None,
+    max_concurrent_solvers: int = MAX_CONCURRENT_SOLVERS,
+    stream_tokens: bool = True
 ) -> AsyncGenerator[Dict[str, Any], None]:
     """
     Wrapper function to process problems and generate solutions with SSE streaming
@@ -17,52 +80,49 @@ async def round_stream(
         problem (str): Original problem description
         follow_up_question (Optional[str]): Optional follow-up question
         metadata (Optional[Dict[str, Any]]): Additional metadata
+        max_concurrent_solvers (int): Maximum number of sub-problems solved at the same time
+        stream_tokens (bool): Forward solver_delta events while solutions are generated
     
     Yields:
-        Dict[str, Any]: Stream of events containing solution updates
+        Dict[str, Any]: subproblem events as the breaker streams each sub-problem, the solver
+        events of every sub-problem and a breakdown event once the breaker has finished
     """
+    language = metadata.get('language', 'English')
     breaker = AIBreaker()
     breaker_request = BreakerRequest(
         originalInput=problem,
         followUpQuestion=follow_up_question,
-        metadata={"language": metadata.get('language', 'English')}
+        metadata={"language": language}
     )
 
-    breakdown = await breaker.process_request(breaker_request)
-    
-    solutions = []
-    sub_problems = breakdown.get('data', {}).get('subProblems', [])
-    
-    if len(sub_problems) > MAX_NODES:
-        sub_problems = sub_problems[:MAX_NODES]
-        
-    for sub_problem in sub_problems:
-        solver = Solver(language=breakdown.get('metadata', {}).get('language', metadata.get('language', 'English')))
-        solver_request = SolverRequest(
-            subProblem=SubProblem(
-                title=sub_problem.get('title', ''),
-                description=sub_problem.get('description', ''),
-                objective=sub_problem.get('objective', ''),
-                id=sub_problem.get('id', ''),
-                language=breakdown.get('metadata', {}).get('language', metadata.get('language', 'English'))
-            ),
-            metadata=breakdown.get('metadata', {'language': metadata.get('language', 'English')})
-        )
-        solution = await solver.solve(solver_request)
-        
-        current_solution = {
-            'id': sub_problem.get('id'),
-            'title': sub_problem.get('title'),
-            'description': sub_problem.get('description'),
-            'objective': sub_problem.get('objective'),
-            'solution': solution.content
-        }
-        solutions.append(current_solution)
-        
-        yield {
-            "event": "solver_output",
-            "data": current_solution
-        }
+    fan_out = FanOut(limit=max_concurrent_solvers)
+    sub_problems = []
+
+    def schedule(sub_problem: Dict[str, Any]) -> None:
+        # Start solving each sub-problem as soon as the breaker has streamed it
+        if len(sub_problems) >= MAX_NODES:
+            return
+        sub_problems.append(sub_problem)
+        fan_out.publish(subproblem_event(sub_problem))
+        fan_out.submit(solve_node(
+            sub_problem=sub_problem,
+            language=language,
+            metadata={'language': language},
+            stream_tokens=stream_tokens
+        ))
+
+    async def break_down() -> AsyncGenerator[Dict[str, Any], None]:
+        try:
+            breakdown = await breaker.stream_process_request(breaker_request, on_subproblem=schedule)
+            # Announce the complete set of child nodes once the breaker has finished
+            yield breakdown_event(sub_problems, breakdown)
+        finally:
+            fan_out.close()
+
+    # The breaker runs alongside the solvers it schedules; events arrive in completion order
+    fan_out.submit(break_down(), limited=False)
+    async for event in fan_out.events():
+        yield event
 
 
 if __name__ == "__main__":
@@ -3,6 +3,8 @@ from typing import Optional
 import os
 from dotenv import load_dotenv
 import logging
+from db.indexes import ensure_indexes
+from db.repository import MongoNodeRepository, NodeRepository
 
 logger = logging.getLogger(__name__)
 
@@ -11,18 +13,50 @@ load_dotenv()
 MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
 logger.info(f"Using MongoDB URL: {MONGODB_URL}")
 
+# Connection pool and timeouts of the one client shared by all DB I/O
+MONGODB_MAX_POOL_SIZE = int(os.getenv("MONGODB_MAX_POOL_SIZE", "100"))
+MONGODB_MIN_POOL_SIZE = int(os.getenv("MONGODB_MIN_POOL_SIZE", "0"))
+MONGODB_MAX_IDLE_TIME_MS = int(os.getenv("MONGODB_MAX_IDLE_TIME_MS", "60000"))
+MONGODB_CONNECT_TIMEOUT_MS = int(os.getenv("MONGODB_CONNECT_TIMEOUT_MS", "5000"))
+MONGODB_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGODB_SOCKET_TIMEOUT_MS = int(os.getenv("MONGODB_SOCKET_TIMEOUT_MS", "30000"))
+MONGODB_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGODB_WAIT_QUEUE_TIMEOUT_MS", "10000"))
+# Reads from secondaries may not see nodes of a round that was flushed just before
+MONGODB_READ_PREFERENCE = os.getenv("MONGODB_READ_PREFERENCE", "primary")
+
+# Where nodes are kept: mongo, sqlite (file at NODE_SQLITE_PATH) or memory (lost on exit)
+NODE_STORE = os.getenv("NODE_STORE", "mongo").lower()
+NODE_STORES = ("mongo", "sqlite", "memory")
+
 client: Optional[AsyncIOMotorClient] = None
+repository: Optional[NodeRepository] = None
+
+def create_client(url: str = MONGODB_URL) -> AsyncIOMotorClient:
+    """Create a motor client with the configured pool, timeouts and read preference; connects lazily"""
+    return AsyncIOMotorClient(
+        url,
+        maxPoolSize=MONGODB_MAX_POOL_SIZE,
+        minPoolSize=MONGODB_MIN_POOL_SIZE,
+        maxIdleTimeMS=MONGODB_MAX_IDLE_TIME_MS,
+        connectTimeoutMS=MONGODB_CONNECT_TIMEOUT_MS,
+        serverSelectionTimeoutMS=MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+        socketTimeoutMS=MONGODB_SOCKET_TIMEOUT_MS,
+        waitQueueTimeoutMS=MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+        readPreference=MONGODB_READ_PREFERENCE,
+        appname="nodetree-backend"
+    )
 
 async def connect_to_mongo():
     global client
     try:
         logger.info("Attempting to connect to MongoDB...")
-        client = AsyncIOMotorClient(MONGODB_URL)
+        client = create_client()
 
         await client.admin.command('ping')
      
         db = client['nodetree']
         await db.create_collection('nodes', check_exists=False)
+        await ensure_indexes(db['nodes'])
         logger.info("Successfully connected to MongoDB and initialized collections")
     except Exception as e:
         logger.error(f"Error connecting to MongoDB: {e}")
@@ -33,6 +67,47 @@ def get_client() -> AsyncIOMotorClient:
         raise RuntimeError("MongoDB client not initialized. Call connect_to_mongo() first.")
     return client
 
+def create_repository(store: str = NODE_STORE) -> NodeRepository:
+    """
+    Create the repository of a local node store
+
+    Args:
+        store: "sqlite" or "memory"
+
+    Raises:
+        ValueError: If store is not a local store
+    """
+    if store == "sqlite":
+        from db.sqlite_store import SQLiteNodeRepository
+        return SQLiteNodeRepository()
+    if store == "memory":
+        from db.memory_store import MemoryNodeRepository
+        return MemoryNodeRepository()
+    raise ValueError(f"Unknown local node store: {store} (expected sqlite or memory)")
+
+async def connect_store():
+    """Open the node store selected by NODE_STORE"""
+    global repository
+    if NODE_STORE not in NODE_STORES:
+        raise ValueError(f"Unknown NODE_STORE: {NODE_STORE} (expected one of {', '.join(NODE_STORES)})")
+    if NODE_STORE == "mongo":
+        await connect_to_mongo()
+        return
+    logger.info(f"Using the {NODE_STORE} node store")
+    repository = create_repository(NODE_STORE)
+
+def get_repository() -> NodeRepository:
+    if repository is not None:
+        return repository
+    return MongoNodeRepository(get_client())
+
+async def close_store():
+    global repository
+    if repository is not None:
+        await repository.close()
+        repository = None
+    await close_mongo_connection()
+
 async def close_mongo_connection():
     global client
     if client:
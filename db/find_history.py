@@ -1,93 +1,203 @@
 from typing import Dict, Any, List, Optional
-from bson import ObjectId
-import uuid
 import logging
-from motor.motor_asyncio import AsyncIOMotorClient
+import os
+from db.node_cache import node_cache
+from db.node_ids import CONTEXT_FIELDS, new_node_id, solution_preview
+from db.repository import NodeRepository
+from db.search import SEARCH_MAX_PAGE_SIZE, parse_query, snippet
 
 logger = logging.getLogger(__name__)
 
-async def get_solution_history(parent_id: str, client: AsyncIOMotorClient) -> List[Dict[str, Any]]:
+# Upper bound on the number of ancestors loaded as context for a new round
+MAX_HISTORY_DEPTH = int(os.getenv("MAX_HISTORY_DEPTH", "50"))
+
+def _rank_history(history: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Order a node-first, nearest-ancestor-next chain by priority, keeping that order among ties"""
+    ranked = sorted(
+        enumerate(history),
+        key=lambda item: (item[1].get('priority', 0), -item[0]),
+        reverse=True
+    )
+    return [solution for _, solution in ranked]
+
+def _cached_history(node_id: str, max_depth: int) -> Optional[List[Dict[str, Any]]]:
+    """The node and its nearest max_depth ancestors, if every one of them is cached"""
+    node = node_cache.get(node_id)
+    if node is None or 'ancestors' not in node:
+        return None
+    wanted = node['ancestors'][::-1][:max_depth] if max_depth > 0 else []
+    found = node_cache.get_many(wanted)
+    if len(found) < len(wanted):
+        return None
+    return [node] + [found[ancestor] for ancestor in wanted]
+
+async def get_solution_history(
+    parent_id: str,
+    repository: NodeRepository,
+    max_depth: int = MAX_HISTORY_DEPTH
+) -> List[Dict[str, Any]]:
     """
-   
+    Fetch a node and its whole ancestry chain in a single aggregation round-trip
+
+    Only the fields needed as context (CONTEXT_FIELDS) are read, and chains whose
+    nodes are all in the node cache are served without a query.
     
     Args:
-        parent_id (str):
-        client (AsyncIOMotorClient): 
+        parent_id (str): Id of the node whose history is requested
+        repository (NodeRepository): Node data access
+        max_depth (int): Maximum number of ancestors followed above the node
     
     Returns:
-        List[Dict[str, Any]]: 
+        List[Dict[str, Any]]: The node and its ancestors, highest priority first and
+        nearest ancestor first among equal priorities
     """
-    history = []
-    current_id = parent_id
-    
-    while current_id is not None:
+    cached = _cached_history(parent_id, max_depth)
+    if cached is not None:
+        return _rank_history(cached)
+
+    try:
+        history = await repository.find_with_ancestors(parent_id, max_depth, CONTEXT_FIELDS)
+    except ValueError as e:
+        logger.error(f"Invalid node id for solution history: {str(e)}")
+        return []
+    except Exception as e:
+        logger.error(f"Error getting solution history: {str(e)}")
+        return []
+
+    node_cache.put_many(history)
+    return _rank_history(history)
+
+async def get_lineage(parent_id: Optional[str], repository: NodeRepository) -> Dict[str, Any]:
+    """
+    Materialized path fields for a new child of parent_id
+
+    Args:
+        parent_id (Optional[str]): Id of the parent node, None for a root node
+        repository (NodeRepository): Node data access
+
+    Returns:
+        Dict[str, Any]: 'ancestors' (ids from the root down to the parent), 'root_id'
+        and 'depth'; root_id is None for a root node, which is its own root. When the
+        parent exists 'parent_id' holds its canonical id.
+    """
+    if not parent_id:
+        return {'ancestors': [], 'root_id': None, 'depth': 0}
+
+    parent = node_cache.get(parent_id)
+    if parent is None or 'ancestors' not in parent:
         try:
-            if len(current_id) == 36:
-                hex_id = uuid.UUID(current_id).hex[:24]
-                current_id = hex_id
-            db = client['nodetree']
-            collection = db['nodes']
-            solution = await collection.find_one({"_id": ObjectId(current_id)})
-            
-            if solution:
-
-                if '_id' in solution:
-                    solution['id'] = current_id if len(current_id) == 36 else str(solution['_id'])
-                history.append(solution)
-                current_id = solution.get('parent_id')
-               #with AI generated exception and current_id 
-
-                if current_id and not len(current_id) == 36:
-                    try:
-                      
-                        current_id = str(uuid.UUID(current_id + '0' * 12))
-                    except ValueError:
-                        logger.error(f"Error converting ObjectId to UUID: {current_id}")
-                        break
-            else:
-                break
-        except Exception as e:
-            logger.error(f"Error getting solution history: {str(e)}")
-            break
-    
+            parent = await repository.find(parent_id, {'id': 1, 'ancestors': 1})
+        except ValueError as e:
+            logger.error(f"Invalid parent id for lineage, saving child as a new root: {str(e)}")
+            return {'ancestors': [], 'root_id': None, 'depth': 0}
+    if parent is None:
+        logger.warning(f"Parent node {parent_id} not found, saving child as a new root")
+        return {'ancestors': [], 'root_id': None, 'depth': 0}
 
-    sorted_history = sorted(
-        history,
-        key=lambda x: (x.get('priority', 0), -history.index(x)),
-        reverse=True
-    )
-    
-    return sorted_history
+    if 'ancestors' in parent:
+        ancestors = parent['ancestors'] + [parent['id']]
+    else:
+        # Parent predates materialized paths (see db/migrations.py), walk its chain instead
+        chain = await repository.find_with_ancestors(parent['id'], fields=('id',))
+        ancestors = [ancestor['id'] for ancestor in reversed(chain)]
+
+    return {'parent_id': parent['id'], 'ancestors': ancestors, 'root_id': ancestors[0], 'depth': len(ancestors)}
+
+async def get_subtree(
+    node_id: str,
+    repository: NodeRepository,
+    max_depth: Optional[int] = None,
+    include_solution: bool = True
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Fetch a node and all of its descendants
 
-async def save_solution(solution_data: Dict[str, Any], client: AsyncIOMotorClient) -> Optional[str]:
+    Descendants are matched through the indexed materialized path (root_id for a
+    root node, ancestors otherwise), so a whole tree is read with one query.
+
+    Args:
+        node_id (str): Id of the subtree root
+        repository (NodeRepository): Node data access
+        max_depth (Optional[int]): Levels returned below the node, None for all
+        include_solution (bool): Whether full solution bodies are returned, or only
+            their solution_preview
+
+    Returns:
+        Optional[List[Dict[str, Any]]]: The node followed by its descendants ordered by
+        depth and creation time, or None if the node does not exist
+    """
+    projection = None if include_solution else {'solution': 0, 'solution_encoding': 0}
+    node = await repository.find(node_id, projection)
+    if node is None:
+        return None
+
+    nodes = [node] + await repository.find_subtree(node, max_depth, projection)
+    node_cache.put_many(nodes)
+    return nodes
+
+async def search_nodes(
+    query: str,
+    repository: NodeRepository,
+    page: int = 1,
+    page_size: int = 20
+) -> Dict[str, Any]:
+    """
+    Search saved nodes by their text
+
+    Args:
+        query (str): Search terms; '-term' excludes nodes containing term
+        repository (NodeRepository): Node data access
+        page (int): 1-based page number
+        page_size (int): Hits per page, at most SEARCH_MAX_PAGE_SIZE
+
+    Returns:
+        Dict[str, Any]: 'total' matching nodes and the 'results' of the page, best
+        first, each with its relevance 'score' and a highlighted 'snippet'
+
+    Raises:
+        ValueError: If the query has no searchable terms or the page is out of range
+    """
+    if not parse_query(query)[0]:
+        raise ValueError("Search query has no searchable terms")
+    if page < 1 or not 1 <= page_size <= SEARCH_MAX_PAGE_SIZE:
+        raise ValueError(f"page must be at least 1 and page_size between 1 and {SEARCH_MAX_PAGE_SIZE}")
+
+    hits, total = await repository.search(query, limit=page_size, skip=(page - 1) * page_size)
+    for hit in hits:
+        hit['snippet'] = snippet(hit, query)
+    return {'total': total, 'page': page, 'page_size': page_size, 'results': hits}
+
+def prepare_node(solution_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Fill in the id, root_id and solution_preview of a node document before it is written
+
+    Args:
+        solution_data (Dict[str, Any]): Node document, updated in place
+
+    Returns:
+        Dict[str, Any]: The same document
+    """
+    if 'id' not in solution_data:
+        solution_data['id'] = new_node_id()
+    if not solution_data.get('root_id'):
+        solution_data['root_id'] = solution_data['id']
+    if isinstance(solution_data.get('solution'), str):
+        solution_data['solution_preview'] = solution_preview(solution_data['solution'])
+    return solution_data
+
+async def save_solution(solution_data: Dict[str, Any], repository: NodeRepository) -> Optional[str]:
 
     try:
-        if 'id' not in solution_data:
-            solution_data['id'] = str(uuid.uuid4())
-        
-        hex_id = uuid.UUID(solution_data['id']).hex[:24]
-        solution_data['_id'] = ObjectId(hex_id)
-    
-        db = client['nodetree']
-        collection = db['nodes']
+        if 'ancestors' not in solution_data:
+            solution_data.update(await get_lineage(solution_data.get('parent_id'), repository))
+        prepare_node(solution_data)
         
         logger.info(f"Attempting to save solution with ID: {solution_data['id']}")
         
-
-        result = await collection.replace_one(
-            {'_id': solution_data['_id']},
-            solution_data,
-            upsert=True
-        )
-        
-        logger.info(f"Save result acknowledged: {result.acknowledged}")
-        if result.acknowledged:
-            logger.info(f"Modified count: {result.modified_count}, Upserted ID: {result.upserted_id}")
-            
-            saved_solution = await collection.find_one({'_id': solution_data['_id']})
-            if saved_solution:
-                logger.info(f"Successfully verified solution save with ID: {solution_data['id']}")
-                return solution_data['id']
+        # An acknowledged upsert is the confirmation, no need to read the document back
+        if await repository.save(solution_data):
+            logger.info(f"Saved solution with ID: {solution_data['id']}")
+            return solution_data['id']
             
         logger.error("Solution was not saved successfully")
         return None
@@ -0,0 +1,172 @@
+# Index set of nodetree.nodes and an explain report of the service's hot queries
+#
+#   python -m db.indexes            # explain the hot queries, exit 1 on a collection scan
+#   python -m db.indexes --ensure   # create missing indexes first
+#
+from typing import Any, Dict, List, Optional
+import asyncio
+import logging
+import sys
+import time
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from pymongo.errors import OperationFailure
+from db.search import SEARCH_FIELD_WEIGHTS
+
+logger = logging.getLogger(__name__)
+
+# Names match the server defaults so indexes created by earlier versions are reused.
+# Node lookups and the ancestry $graphLookup use the built-in _id index.
+NODE_INDEXES: List[IndexModel] = [
+    # Children of a node, highest priority first
+    IndexModel(
+        [('parent_id', ASCENDING), ('priority', DESCENDING), ('created_at', ASCENDING)],
+        name='parent_id_1_priority_-1_created_at_1'
+    ),
+    # Subtree and whole-tree reads on the materialized path
+    IndexModel([('ancestors', ASCENDING), ('depth', ASCENDING)], name='ancestors_1_depth_1'),
+    IndexModel([('root_id', ASCENDING), ('depth', ASCENDING)], name='root_id_1_depth_1'),
+    IndexModel([('priority', DESCENDING), ('created_at', DESCENDING)], name='priority_-1_created_at_-1'),
+    IndexModel([('created_at', DESCENDING)], name='created_at_-1'),
+    # Full-text search over node content; a collection can only have one text index
+    IndexModel(
+        [(field, TEXT) for field in SEARCH_FIELD_WEIGHTS],
+        name='node_text',
+        # Compressed solutions are not indexed, their uncompressed preview still is
+        weights=SEARCH_FIELD_WEIGHTS,
+        default_language='english'
+    ),
+]
+
+
+async def ensure_indexes(collection: AsyncIOMotorCollection, indexes: List[IndexModel] = NODE_INDEXES) -> List[str]:
+    """
+    Create every declared index that does not exist yet
+
+    Creating an index that already exists with the same definition is a no-op, so
+    this is safe to run on every startup. An index whose name or key is already
+    taken by a different definition is logged and skipped, not dropped.
+
+    Args:
+        collection (AsyncIOMotorCollection): Collection to index
+        indexes (List[IndexModel]): Declared indexes
+
+    Returns:
+        List[str]: Names of the indexes that are in place
+    """
+    names = []
+    for index in indexes:
+        try:
+            names.extend(await collection.create_indexes([index]))
+        except OperationFailure as e:
+            logger.error(f"Could not create index {index.document['name']}: {str(e)}")
+    logger.info(f"Indexes in place on {collection.name}: {', '.join(names)}")
+    return names
+
+
+def _walk(plan: Any) -> List[Dict[str, Any]]:
+    """Every stage of an explain plan, outermost first"""
+    nodes = []
+    if isinstance(plan, dict):
+        if 'stage' in plan:
+            nodes.append(plan)
+        for value in plan.values():
+            nodes.extend(_walk(value))
+    elif isinstance(plan, list):
+        for value in plan:
+            nodes.extend(_walk(value))
+    return nodes
+
+
+def _hot_queries(sample: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """The finds the service issues, filled in with values from a sample node"""
+    node_id = sample.get('_id')
+    parent_id = sample.get('parent_id') or node_id
+    root_id = sample.get('root_id') or node_id
+    return {
+        'node_by_id': {'filter': {'_id': node_id}},
+        'children_by_priority': {
+            'filter': {'parent_id': parent_id},
+            'sort': [('priority', DESCENDING), ('created_at', ASCENDING)]
+        },
+        'subtree': {'filter': {'ancestors': parent_id, 'depth': {'$lte': sample.get('depth', 0) + 2}}},
+        'whole_tree': {'filter': {'root_id': root_id}, 'sort': [('depth', ASCENDING), ('created_at', ASCENDING)]},
+        'top_priority': {'filter': {}, 'sort': [('priority', DESCENDING), ('created_at', DESCENDING)], 'limit': 50},
+        'recent': {'filter': {}, 'sort': [('created_at', DESCENDING)], 'limit': 50},
+        'text_search': {'filter': {'$text': {'$search': sample.get('title') or 'solution'}}, 'limit': 20},
+    }
+
+
+async def explain_hot_queries(client: AsyncIOMotorClient) -> List[Dict[str, Any]]:
+    """
+    Run explain on the service's hot queries and flag collection scans
+
+    Args:
+        client (AsyncIOMotorClient): MongoDB client
+
+    Returns:
+        List[Dict[str, Any]]: Per query its plan stages, the index used, documents and
+        keys examined and whether it scans the whole collection
+    """
+    collection = client['nodetree']['nodes']
+    sample: Optional[Dict[str, Any]] = await collection.find_one(
+        {'depth': {'$gt': 0}},
+        {'parent_id': 1, 'root_id': 1, 'depth': 1, 'title': 1}
+    ) or await collection.find_one({}, {'parent_id': 1, 'root_id': 1, 'depth': 1, 'title': 1}) or {}
+
+    report = []
+    for name, query in _hot_queries(sample).items():
+        cursor = collection.find(query['filter'])
+        if 'sort' in query:
+            cursor = cursor.sort(query['sort'])
+        if 'limit' in query:
+            cursor = cursor.limit(query['limit'])
+        started = time.perf_counter()
+        try:
+            explain = await cursor.explain()
+        except OperationFailure as e:
+            report.append({'query': name, 'error': str(e), 'collscan': None})
+            continue
+        plan = _walk(explain.get('queryPlanner', {}).get('winningPlan', {}))
+        stages = [stage['stage'] for stage in plan]
+        indexes = sorted({stage['indexName'] for stage in plan if stage.get('indexName')})
+        stats = explain.get('executionStats', {})
+        report.append({
+            'query': name,
+            'stages': stages,
+            'indexes': indexes,
+            'collscan': 'COLLSCAN' in stages,
+            'docs_examined': stats.get('totalDocsExamined'),
+            'keys_examined': stats.get('totalKeysExamined'),
+            'returned': stats.get('nReturned'),
+            'explain_ms': round((time.perf_counter() - started) * 1000, 2)
+        })
+    return report
+
+
+async def main(ensure: bool) -> int:
+    from db.database import create_client
+
+    client = create_client()
+    try:
+        if ensure:
+            await ensure_indexes(client['nodetree']['nodes'])
+        report = await explain_hot_queries(client)
+    finally:
+        client.close()
+
+    for row in report:
+        if row.get('error'):
+            print(f"{row['query']:<22} ERROR {row['error']}")
+            continue
+        flag = "COLLSCAN" if row['collscan'] else "ok"
+        print(
+            f"{row['query']:<22} {flag:<9} {' > '.join(row['stages']):<40} "
+            f"index={','.join(row['indexes']) or '-'} docs={row['docs_examined']} keys={row['keys_examined']}"
+        )
+    return 1 if any(row.get('collscan') for row in report) else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(main("--ensure" in sys.argv[1:])))
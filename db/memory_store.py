@@ -0,0 +1,109 @@
+from typing import Any, Dict, List, Optional, Set, Tuple
+from collections import defaultdict
+import copy
+from pymongo.write_concern import WriteConcern
+from db.node_ids import canonical_id, solution_preview
+from db.repository import NodeRepository, project
+from db.search import SEARCH_FIELD_WEIGHTS, SEARCH_RESULT_FIELDS, InvertedIndex
+
+
+def _order(node: Dict[str, Any]) -> Tuple[int, str]:
+    return node.get('depth', 0), str(node.get('created_at', ''))
+
+
+class MemoryNodeRepository(NodeRepository):
+    """
+    Nodes held in process memory, lost when the process exits
+
+    Meant for tests, benchmarks and single-process deployments. Besides the
+    nodes by id it keeps, per node, the ids of all its descendants (from their
+    materialized ancestors) so subtree reads do not scan every node, and an
+    inverted index of their text for search. Documents are copied on the way
+    in and out, as they would be by a database.
+    """
+
+    def __init__(self):
+        self._nodes: Dict[str, Dict[str, Any]] = {}
+        self._descendants: Dict[str, Set[str]] = defaultdict(set)
+        self._text = InvertedIndex()
+
+    async def find(self, node_id: str, projection: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        node = self._nodes.get(canonical_id(node_id))
+        return copy.deepcopy(project(node, projection)) if node is not None else None
+
+    async def find_with_ancestors(
+        self,
+        node_id: str,
+        max_depth: Optional[int] = None,
+        fields: Optional[Tuple[str, ...]] = None
+    ) -> List[Dict[str, Any]]:
+        projection = {field: 1 for field in fields} if fields is not None else None
+        chain = []
+        seen: Set[str] = set()
+        node = self._nodes.get(canonical_id(node_id))
+        while node is not None and node['id'] not in seen:
+            chain.append(copy.deepcopy(project(node, projection)))
+            seen.add(node['id'])
+            if max_depth is not None and len(chain) > max_depth:
+                break
+            node = self._nodes.get(node.get('parent_id') or '')
+        return chain
+
+    async def find_subtree(
+        self,
+        node: Dict[str, Any],
+        max_depth: Optional[int] = None,
+        projection: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        deepest = node.get('depth', 0) + max_depth if max_depth is not None else None
+        descendants = [
+            self._nodes[descendant] for descendant in self._descendants.get(node['id'], ())
+            if descendant in self._nodes
+        ]
+        if deepest is not None:
+            descendants = [descendant for descendant in descendants if descendant.get('depth', 0) <= deepest]
+        return [copy.deepcopy(project(descendant, projection)) for descendant in sorted(descendants, key=_order)]
+
+    async def search(self, query: str, limit: int = 20, skip: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+        ranked, total = self._text.search(query, limit, skip)
+        projection = {field: 1 for field in SEARCH_RESULT_FIELDS}
+        return [{**copy.deepcopy(project(self._nodes[node_id], projection)), 'score': score} for node_id, score in ranked], total
+
+    def _put(self, node: Dict[str, Any], reindex: bool = True) -> None:
+        node = copy.deepcopy(node)
+        node['id'] = canonical_id(node['id'])
+        if isinstance(node.get('solution'), str):
+            node.setdefault('solution_preview', solution_preview(node['solution']))
+        previous = self._nodes.get(node['id'])
+        if previous is not None:
+            for ancestor in previous.get('ancestors', []):
+                self._descendants[ancestor].discard(node['id'])
+        self._nodes[node['id']] = node
+        for ancestor in node.get('ancestors', []):
+            self._descendants[ancestor].add(node['id'])
+        if reindex:
+            self._text.add(node)
+
+    async def _save(self, node: Dict[str, Any]) -> bool:
+        self._put(node)
+        return True
+
+    async def _save_many(self, nodes: List[Dict[str, Any]], write_concern: Optional[WriteConcern]) -> None:
+        for node in nodes:
+            self._put(node)
+
+    async def _update(self, node_id: str, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        node = self._nodes.get(canonical_id(node_id))
+        if node is None:
+            return None
+        self._put({**node, **fields}, reindex=any(field in SEARCH_FIELD_WEIGHTS for field in fields))
+        return copy.deepcopy(self._nodes[node['id']])
+
+    async def _delete(self, node_id: str) -> Optional[str]:
+        node = self._nodes.pop(canonical_id(node_id), None)
+        if node is None:
+            return None
+        for ancestor in node.get('ancestors', []):
+            self._descendants[ancestor].discard(node['id'])
+        self._text.remove(node['id'])
+        return node['id']
@@ -0,0 +1,195 @@
+# One-off data migrations for nodetree.nodes
+#
+#   python -m db.migrations
+#
+from typing import Any, Dict, List, Optional
+import asyncio
+import logging
+import uuid
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReplaceOne, UpdateOne
+from pymongo.errors import OperationFailure
+from db.node_ids import ID_FIELDS, ID_LIST_FIELDS, NODE_COMPRESS_SOLUTION, from_db_node, to_db_node
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+
+
+def _legacy_uuid(object_id: ObjectId) -> str:
+    # Documents saved without an 'id' only have the 12 bytes of their ObjectId
+    return str(uuid.UUID(str(object_id) + '0' * 8))
+
+
+async def migrate_node_ids(client: AsyncIOMotorClient, batch_size: int = BATCH_SIZE) -> int:
+    """
+    Re-key nodes stored under an ObjectId _id by their binary UUID
+
+    Nodes used to be stored under the first 24 hex digits of their UUID with the
+    full UUID in 'id', and referenced their parent by either form. Each such
+    node is rewritten under its binary UUID (see db/node_ids.py) with binary
+    references, and the old document is removed. Safe to run repeatedly.
+
+    Args:
+        client (AsyncIOMotorClient): MongoDB client
+        batch_size (int): Documents rewritten per bulk write
+
+    Returns:
+        int: Number of nodes migrated
+    """
+    collection = client['nodetree']['nodes']
+    legacy = {'_id': {'$type': 'objectId'}}
+
+    # Every spelling of a legacy id, mapped to the full UUID
+    uuids: Dict[str, str] = {}
+    async for node in collection.find(legacy, {'id': 1}):
+        node_uuid = node.get('id') or _legacy_uuid(node['_id'])
+        uuids[str(node['_id'])] = node_uuid
+        uuids[node_uuid] = node_uuid
+
+    def resolve(reference: Any) -> Any:
+        if isinstance(reference, str):
+            return uuids.get(reference, reference)
+        return reference
+
+    async def write(replacements: List[ReplaceOne], old_ids: List[ObjectId]) -> None:
+        # Insert the new documents before removing the old ones so nothing is lost midway
+        await collection.bulk_write(replacements, ordered=False)
+        await collection.delete_many({'_id': {'$in': old_ids}})
+
+    replacements: List[ReplaceOne] = []
+    old_ids: List[ObjectId] = []
+    migrated = 0
+    async for node in collection.find(legacy):
+        legacy_id = node.pop('_id')
+        old_ids.append(legacy_id)
+        node['id'] = node.get('id') or _legacy_uuid(legacy_id)
+        for field in ID_FIELDS:
+            if node.get(field):
+                node[field] = resolve(node[field])
+        for field in ID_LIST_FIELDS:
+            if field in node:
+                node[field] = [resolve(reference) for reference in node[field]]
+        document = to_db_node(node)
+        replacements.append(ReplaceOne({'_id': document['_id']}, document, upsert=True))
+        if len(replacements) >= batch_size:
+            await write(replacements, old_ids)
+            migrated += len(replacements)
+            replacements, old_ids = [], []
+    if replacements:
+        await write(replacements, old_ids)
+        migrated += len(replacements)
+
+    try:
+        await collection.drop_index('id_1')
+    except OperationFailure:
+        pass
+
+    logger.info(f"Migrated {migrated} nodes to binary UUID ids")
+    return migrated
+
+
+async def backfill_ancestors(client: AsyncIOMotorClient, batch_size: int = BATCH_SIZE) -> int:
+    """
+    Set ancestors, root_id and depth on nodes saved before paths were materialized
+
+    Nodes whose parent no longer exists become roots of their own tree. Run
+    after migrate_node_ids.
+
+    Args:
+        client (AsyncIOMotorClient): MongoDB client
+        batch_size (int): Updates sent per bulk write
+
+    Returns:
+        int: Number of nodes updated
+    """
+    collection = client['nodetree']['nodes']
+    nodes: Dict[Any, Dict[str, Any]] = {}
+    async for node in collection.find({}, {'parent_id': 1, 'ancestors': 1}):
+        nodes[node['_id']] = node
+
+    def ancestors_of(node: Dict[str, Any]) -> List[Any]:
+        chain: List[Any] = []
+        seen = {node['_id']}
+        parent: Optional[Dict[str, Any]] = nodes.get(node.get('parent_id'))
+        while parent is not None and parent['_id'] not in seen:
+            chain.append(parent['_id'])
+            seen.add(parent['_id'])
+            parent = nodes.get(parent.get('parent_id'))
+        return chain[::-1]
+
+    updates: List[UpdateOne] = []
+    updated = 0
+    for node in nodes.values():
+        if 'ancestors' in node:
+            continue
+        ancestors = ancestors_of(node)
+        updates.append(UpdateOne({'_id': node['_id']}, {'$set': {
+            'ancestors': ancestors,
+            'root_id': ancestors[0] if ancestors else node['_id'],
+            'depth': len(ancestors)
+        }}))
+        if len(updates) >= batch_size:
+            await collection.bulk_write(updates, ordered=False)
+            updated += len(updates)
+            updates = []
+    if updates:
+        await collection.bulk_write(updates, ordered=False)
+        updated += len(updates)
+
+    logger.info(f"Backfilled materialized paths on {updated} nodes")
+    return updated
+
+
+async def backfill_solution_previews(client: AsyncIOMotorClient, batch_size: int = BATCH_SIZE) -> int:
+    """
+    Add solution_preview to nodes saved without one, compressing their solution
+    when NODE_COMPRESS_SOLUTION is enabled
+
+    Args:
+        client (AsyncIOMotorClient): MongoDB client
+        batch_size (int): Updates sent per bulk write
+
+    Returns:
+        int: Number of nodes updated
+    """
+    collection = client['nodetree']['nodes']
+    query: Dict[str, Any] = {'solution': {'$type': 'string'}}
+    if not NODE_COMPRESS_SOLUTION:
+        query['solution_preview'] = {'$exists': False}
+
+    updates: List[UpdateOne] = []
+    updated = 0
+    async for node in collection.find(query, {'solution': 1, 'solution_preview': 1}):
+        node_id = node['_id']
+        stored = to_db_node(from_db_node(node))
+        fields = {field: stored[field] for field in ('solution', 'solution_preview', 'solution_encoding') if field in stored}
+        updates.append(UpdateOne({'_id': node_id}, {'$set': fields}))
+        if len(updates) >= batch_size:
+            await collection.bulk_write(updates, ordered=False)
+            updated += len(updates)
+            updates = []
+    if updates:
+        await collection.bulk_write(updates, ordered=False)
+        updated += len(updates)
+
+    logger.info(f"Backfilled solution previews on {updated} nodes")
+    return updated
+
+
+async def main():
+    from db.database import connect_to_mongo, get_client, close_mongo_connection
+
+    await connect_to_mongo()
+    try:
+        await migrate_node_ids(get_client())
+        await backfill_ancestors(get_client())
+        await backfill_solution_previews(get_client())
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
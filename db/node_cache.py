@@ -0,0 +1,133 @@
+from typing import Any, Dict, Iterable, Optional, Tuple
+from collections import OrderedDict
+import os
+import time
+import bson
+from dotenv import load_dotenv
+from db.node_ids import CONTEXT_FIELDS
+
+load_dotenv()
+
+NODE_CACHE_ENABLED = os.getenv("NODE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+NODE_CACHE_MAX_BYTES = int(os.getenv("NODE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Bounds how long a node changed by another worker process can be served stale
+NODE_CACHE_TTL = float(os.getenv("NODE_CACHE_TTL", "300"))
+
+
+def _size_of(node: Dict[str, Any]) -> int:
+    try:
+        return len(bson.encode(node))
+    except Exception:
+        return len(repr(node))
+
+
+class NodeCache:
+    """
+    Byte-bounded LRU of node documents (API form) keyed by node id
+
+    Only the context fields of a node are kept, not its full solution. Every
+    node carries its materialized ancestors, so a cached node plus its
+    cached ancestors is a complete ancestry chain. Writers keep the cache
+    current: saves and updates put the new document, deletes invalidate it.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = NODE_CACHE_MAX_BYTES,
+        ttl: float = NODE_CACHE_TTL,
+        enabled: bool = NODE_CACHE_ENABLED,
+        fields: Tuple[str, ...] = CONTEXT_FIELDS
+    ):
+        """
+        Initialize the cache
+
+        Args:
+            max_bytes: Upper bound of the BSON size of all cached documents
+            ttl: Seconds a document is served before it is read again
+            enabled: When False nothing is cached
+            fields: Fields of a node that are kept
+        """
+        self.fields = fields
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.enabled = enabled
+        self._entries: "OrderedDict[str, Tuple[float, int, Dict[str, Any]]]" = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, node_id: str) -> Optional[Dict[str, Any]]:
+        """Copy of a cached node, or None"""
+        if not self.enabled:
+            return None
+        entry = self._entries.get(node_id)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                self._remove(node_id)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(node_id)
+        self.hits += 1
+        return dict(entry[2])
+
+    def get_many(self, node_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Copies of the cached nodes among node_ids, by id"""
+        found = {}
+        for node_id in node_ids:
+            node = self.get(node_id)
+            if node is not None:
+                found[node_id] = node
+        return found
+
+    def put(self, node: Dict[str, Any]) -> None:
+        """Cache (or replace) a node document; it must have its string 'id'"""
+        if not self.enabled or not node.get('id'):
+            return
+        node = {field: node[field] for field in self.fields if field in node}
+        node_id = node['id']
+        size = _size_of(node)
+        if size > self.max_bytes:
+            self._remove(node_id)
+            return
+        self._remove(node_id)
+        self._entries[node_id] = (time.monotonic() + self.ttl, size, node)
+        self.size += size
+        while self.size > self.max_bytes:
+            evicted, _ = next(iter(self._entries.items()))
+            self._remove(evicted)
+            self.evictions += 1
+
+    def put_many(self, nodes: Iterable[Dict[str, Any]]) -> None:
+        for node in nodes:
+            self.put(node)
+
+    def invalidate(self, node_id: str) -> None:
+        """Drop a node, e.g. after it was deleted"""
+        self._remove(node_id)
+
+    def _remove(self, node_id: str) -> None:
+        entry = self._entries.pop(node_id, None)
+        if entry is not None:
+            self.size -= entry[1]
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit rate, size and eviction counters"""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions
+        }
+
+
+node_cache = NodeCache()
@@ -0,0 +1,190 @@
+from typing import Any, Dict, List, Union
+from bson import Binary, ObjectId
+from bson.binary import UUID_SUBTYPE
+import os
+import uuid
+import zlib
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Node ids are UUIDs. In Mongo they are stored natively as 16-byte BSON binary
+# (subtype 4) in _id, parent_id, root_id and ancestors; everywhere else, API
+# payloads included, they are canonical 36-character strings under 'id'.
+
+ID_FIELDS = ('parent_id', 'root_id')
+ID_LIST_FIELDS = ('ancestors',)
+
+# Store the solution body zlib-compressed when it is at least NODE_COMPRESS_MIN_BYTES long
+NODE_COMPRESS_SOLUTION = os.getenv("NODE_COMPRESS_SOLUTION", "false").lower() in ("1", "true", "yes")
+NODE_COMPRESS_MIN_BYTES = int(os.getenv("NODE_COMPRESS_MIN_BYTES", "1024"))
+NODE_COMPRESS_LEVEL = int(os.getenv("NODE_COMPRESS_LEVEL", "6"))
+
+# Characters of the solution kept uncompressed in solution_preview for context building
+SOLUTION_PREVIEW_CHARS = 1000
+
+# Fields read when a node is used as context for a new round
+CONTEXT_FIELDS = ('id', 'title', 'problem', 'solution_preview', 'priority', 'parent_id', 'ancestors', 'root_id', 'depth', 'created_at')
+
+NodeId = Union[str, uuid.UUID]
+
+
+def new_node_id() -> str:
+    """Generate a new node id"""
+    return str(uuid.uuid4())
+
+
+def canonical_id(node_id: NodeId) -> str:
+    """
+    Canonical 36-character string of a node id
+
+    Raises:
+        ValueError: If node_id is not a UUID
+    """
+    try:
+        return str(node_id if isinstance(node_id, uuid.UUID) else uuid.UUID(node_id))
+    except (AttributeError, TypeError, ValueError) as e:
+        raise ValueError(f"Invalid node id: {node_id}") from e
+
+
+def to_db_id(node_id: NodeId) -> Binary:
+    """
+    Encode a node id for storage
+
+    Args:
+        node_id: UUID string (with or without dashes) or UUID
+
+    Raises:
+        ValueError: If node_id is not a UUID
+    """
+    if not isinstance(node_id, uuid.UUID):
+        node_id = uuid.UUID(node_id)
+    return Binary(node_id.bytes, UUID_SUBTYPE)
+
+
+def from_db_id(value: Any) -> Any:
+    """
+    Decode a stored node id to its canonical string
+
+    Legacy ObjectId ids decode to their hex string; anything else that is not an
+    id (None, plain strings) is returned unchanged.
+    """
+    if isinstance(value, Binary) and len(value) == 16:
+        return str(uuid.UUID(bytes=bytes(value)))
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, ObjectId):
+        return str(value)
+    return value
+
+
+def _to_db_ref(value: Any) -> Any:
+    # References that are not UUIDs (legacy or dangling ids) are stored as they are
+    if isinstance(value, str):
+        try:
+            return to_db_id(value)
+        except ValueError:
+            return value
+    return value
+
+
+def solution_preview(solution: str) -> str:
+    """Start of a solution, marked with an ellipsis when it was cut"""
+    if len(solution) <= SOLUTION_PREVIEW_CHARS:
+        return solution
+    return solution[:SOLUTION_PREVIEW_CHARS] + "..."
+
+
+def _compress_solution(document: Dict[str, Any]) -> None:
+    raw = document['solution'].encode('utf-8')
+    if len(raw) >= NODE_COMPRESS_MIN_BYTES:
+        document['solution'] = Binary(zlib.compress(raw, NODE_COMPRESS_LEVEL))
+        document['solution_encoding'] = 'zlib'
+
+
+def _decompress_solution(document: Dict[str, Any]) -> None:
+    if document.pop('solution_encoding', None) == 'zlib' and 'solution' in document:
+        document['solution'] = zlib.decompress(bytes(document['solution'])).decode('utf-8')
+
+
+def id_filter(node_id: str) -> Dict[str, Any]:
+    """
+    Query filter matching a node by its id
+
+    Documents that have not been migrated yet (ObjectId _id made of the first
+    24 hex digits of the UUID) are matched as well, and a legacy 24-hex id
+    matches the binary UUID it was truncated from.
+
+    Args:
+        node_id: UUID string or legacy 24-hex ObjectId string
+
+    Raises:
+        ValueError: If node_id is neither format
+    """
+    try:
+        if len(node_id) == 24:
+            prefix = bytes.fromhex(node_id)
+            return {'$or': [
+                {'_id': ObjectId(node_id)},
+                {'_id': {
+                    '$gte': Binary(prefix + b'\x00' * 4, UUID_SUBTYPE),
+                    '$lte': Binary(prefix + b'\xff' * 4, UUID_SUBTYPE)
+                }}
+            ]}
+        db_id = to_db_id(node_id)
+        return {'_id': {'$in': [db_id, ObjectId(bytes(db_id)[:12])]}}
+    except Exception as e:
+        raise ValueError(f"Invalid node id: {node_id}") from e
+
+
+def to_db_node(node: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Copy of an API node document in its stored form
+
+    Args:
+        node: Node document with a string 'id'
+
+    Returns:
+        Dict[str, Any]: Document keyed by a binary _id, with binary references, a
+        solution_preview and, if enabled, a compressed solution body
+    """
+    document = dict(node)
+    document['_id'] = to_db_id(document.pop('id'))
+    if isinstance(document.get('solution'), str):
+        document.setdefault('solution_preview', solution_preview(document['solution']))
+        if NODE_COMPRESS_SOLUTION:
+            _compress_solution(document)
+    for field in ID_FIELDS:
+        if document.get(field):
+            document[field] = _to_db_ref(document[field])
+    for field in ID_LIST_FIELDS:
+        if field in document:
+            document[field] = [_to_db_ref(value) for value in document[field]]
+    return document
+
+
+def from_db_node(document: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convert a stored node document to its API form in place
+
+    Args:
+        document: Document read from Mongo
+
+    Returns:
+        Dict[str, Any]: The same document with a string 'id' instead of _id and
+        its solution body decompressed
+    """
+    _decompress_solution(document)
+    if '_id' in document:
+        stored_id = document.pop('_id')
+        # Not yet migrated documents carry the full UUID next to their ObjectId
+        document['id'] = document.get('id') or from_db_id(stored_id)
+    for field in ID_FIELDS:
+        if field in document:
+            document[field] = from_db_id(document[field])
+    for field in ID_LIST_FIELDS:
+        if field in document:
+            document[field] = [from_db_id(value) for value in document[field]]
+    return document
+
+
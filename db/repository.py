@@ -0,0 +1,344 @@
+from typing import Any, Dict, List, Optional, Tuple
+from abc import ABC, abstractmethod
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection
+from pymongo import ReplaceOne, ReturnDocument
+from pymongo.write_concern import WriteConcern
+
+from db.node_cache import node_cache
+from db.node_ids import from_db_node, id_filter, to_db_id, to_db_node
+from db.search import SEARCH_RESULT_FIELDS
+
+
+DATABASE_NAME = "nodetree"
+NODES_COLLECTION = "nodes"
+
+
+def project(node: Dict[str, Any], projection: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Apply a top-level Mongo-style projection to a node in API form
+
+    Args:
+        node: Node document
+        projection: Either only inclusions ({'title': 1}) or only exclusions
+            ({'solution': 0}); 'id' is always kept. None keeps every field
+
+    Returns:
+        Dict[str, Any]: The projected copy
+    """
+    if not projection:
+        return dict(node)
+    if any(projection.values()):
+        return {field: value for field, value in node.items() if field == 'id' or projection.get(field)}
+    return {field: value for field, value in node.items() if field not in projection}
+
+
+class NodeRepository(ABC):
+    """
+    Storage interface for nodes
+
+    Documents come in and go out in their API form (string ids, see
+    db/node_ids.py). Mutations write the new documents through to the node
+    cache; backends implement the underscored primitives.
+    """
+
+    @abstractmethod
+    async def find(self, node_id: str, projection: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Read one node
+
+        Args:
+            node_id: Node id
+            projection: Fields to read, all when None
+
+        Raises:
+            ValueError: If node_id is not a node id
+        """
+
+    @abstractmethod
+    async def find_with_ancestors(
+        self,
+        node_id: str,
+        max_depth: Optional[int] = None,
+        fields: Optional[Tuple[str, ...]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Read a node and its ancestors
+
+        Args:
+            node_id: Node id
+            max_depth: Ancestors followed above the node, all when None
+            fields: Fields read for every node, all when None
+
+        Returns:
+            List[Dict[str, Any]]: The node, then its parent, grandparent, ...; empty
+            when the node does not exist
+
+        Raises:
+            ValueError: If node_id is not a node id
+        """
+
+    @abstractmethod
+    async def find_subtree(
+        self,
+        node: Dict[str, Any],
+        max_depth: Optional[int] = None,
+        projection: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Read the descendants of a node through its materialized path
+
+        Args:
+            node: The subtree root, as returned by find
+            max_depth: Levels read below the node, all when None
+            projection: Fields to read, all when None
+
+        Returns:
+            List[Dict[str, Any]]: Descendants ordered by depth and creation time
+        """
+
+    @abstractmethod
+    async def search(self, query: str, limit: int = 20, skip: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Full-text search over the text fields of the nodes
+
+        Args:
+            query: Search terms; any may match, '-term' excludes nodes containing term
+            limit: Hits returned
+            skip: Hits skipped before the first one returned
+
+        Returns:
+            Tuple[List[Dict[str, Any]], int]: The page of hits, most relevant first,
+            each with the SEARCH_RESULT_FIELDS and its 'score', and the number of
+            matching nodes
+        """
+
+    @abstractmethod
+    async def _save(self, node: Dict[str, Any]) -> bool:
+        ...
+
+    @abstractmethod
+    async def _save_many(self, nodes: List[Dict[str, Any]], write_concern: Optional[WriteConcern]) -> None:
+        ...
+
+    @abstractmethod
+    async def _update(self, node_id: str, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    async def _delete(self, node_id: str) -> Optional[str]:
+        ...
+
+    async def save(self, node: Dict[str, Any]) -> bool:
+        """
+        Insert or replace one node
+
+        Args:
+            node: Node document with its id
+
+        Returns:
+            bool: Whether the write was acknowledged
+        """
+        saved = await self._save(node)
+        if saved:
+            node_cache.put(node)
+        return saved
+
+    async def save_many(self, nodes: List[Dict[str, Any]], write_concern: Optional[WriteConcern] = None) -> None:
+        """
+        Insert or replace nodes in one batch
+
+        Args:
+            nodes: Node documents with their ids
+            write_concern: Write concern of the batch where the backend has one, its default when None
+        """
+        await self._save_many(nodes, write_concern)
+        node_cache.put_many(nodes)
+
+    async def update(self, node_id: str, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Set fields on a node
+
+        Args:
+            node_id: Node id
+            fields: Field values to set
+
+        Returns:
+            Optional[Dict[str, Any]]: The updated node, or None if it does not exist
+
+        Raises:
+            ValueError: If node_id is not a node id
+        """
+        node = await self._update(node_id, fields)
+        if node is not None:
+            node_cache.put(node)
+        return node
+
+    async def set_priority(self, node_id: str, priority: int) -> Optional[Dict[str, Any]]:
+        """Update the priority of a node; see update"""
+        return await self.update(node_id, {'priority': priority})
+
+    async def delete(self, node_id: str) -> bool:
+        """
+        Delete one node
+
+        Returns:
+            bool: Whether a node was deleted
+
+        Raises:
+            ValueError: If node_id is not a node id
+        """
+        deleted = await self._delete(node_id)
+        if deleted is None:
+            return False
+        node_cache.invalidate(deleted)
+        return True
+
+    async def close(self) -> None:
+        """Release the resources of the backend"""
+
+
+class MongoNodeRepository(NodeRepository):
+    """Nodes in nodetree.nodes on the shared motor client"""
+
+    def __init__(self, client: AsyncIOMotorClient, database: str = DATABASE_NAME, collection: str = NODES_COLLECTION):
+        """
+        Initialize the repository
+
+        Args:
+            client: Shared motor client, see db.database.connect_to_mongo
+            database: Database name
+            collection: Collection name
+        """
+        self.client = client
+        self.collection: AsyncIOMotorCollection = client[database][collection]
+
+    async def find(self, node_id: str, projection: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Read one node
+
+        Args:
+            node_id: Node id
+            projection: Fields to read, all when None
+
+        Raises:
+            ValueError: If node_id is not a node id
+        """
+        document = await self.collection.find_one(id_filter(node_id), projection)
+        return from_db_node(document) if document is not None else None
+
+    async def find_with_ancestors(
+        self,
+        node_id: str,
+        max_depth: Optional[int] = None,
+        fields: Optional[Tuple[str, ...]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Read a node and its ancestors in one $graphLookup aggregation
+
+        Args:
+            node_id: Node id
+            max_depth: Ancestors followed above the node, all when None
+            fields: Fields read for every node, all when None
+
+        Returns:
+            List[Dict[str, Any]]: The node, then its parent, grandparent, ...; empty
+            when the node does not exist
+
+        Raises:
+            ValueError: If node_id is not a node id
+        """
+        pipeline: List[Dict[str, Any]] = [{"$match": id_filter(node_id)}]
+        if max_depth is None or max_depth > 0:
+            lookup = {
+                "from": self.collection.name,
+                "startWith": "$parent_id",
+                "connectFromField": "parent_id",
+                "connectToField": "_id",
+                "as": "ancestors_chain",
+                "depthField": "hops"
+            }
+            if max_depth is not None:
+                lookup["maxDepth"] = max_depth - 1
+            pipeline.append({"$graphLookup": lookup})
+        if fields is not None:
+            projection = {field: 1 for field in fields}
+            projection.update({f"ancestors_chain.{field}": 1 for field in fields})
+            projection.update({"ancestors_chain._id": 1, "ancestors_chain.hops": 1})
+            pipeline.append({"$project": projection})
+
+        results = await self.collection.aggregate(pipeline).to_list(length=1)
+        if not results:
+            return []
+
+        node = results[0]
+        chain = node.pop('ancestors_chain', [])
+        # Place every ancestor by its distance: index 0 is the node itself, index h + 1 its ancestor h hops up
+        ordered: List[Optional[Dict[str, Any]]] = [node] + [None] * len(chain)
+        for ancestor in chain:
+            hops = ancestor.pop('hops', 0)
+            if 0 <= hops < len(chain):
+                ordered[hops + 1] = ancestor
+        return [from_db_node(document) for document in ordered if document is not None]
+
+    async def find_subtree(
+        self,
+        node: Dict[str, Any],
+        max_depth: Optional[int] = None,
+        projection: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Read the descendants of a node through its materialized path
+
+        Args:
+            node: The subtree root, as returned by find
+            max_depth: Levels read below the node, all when None
+            projection: Fields to read, all when None
+
+        Returns:
+            List[Dict[str, Any]]: Descendants ordered by depth and creation time
+        """
+        root = to_db_id(node['id'])
+        depth = node.get('depth', 0)
+        if depth == 0:
+            query: Dict[str, Any] = {'root_id': root, '_id': {'$ne': root}}
+        else:
+            query = {'ancestors': root}
+        if max_depth is not None:
+            query['depth'] = {'$lte': depth + max_depth}
+
+        cursor = self.collection.find(query, projection).sort([('depth', 1), ('created_at', 1)])
+        return [from_db_node(document) for document in await cursor.to_list(length=None)]
+
+    async def search(self, query: str, limit: int = 20, skip: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+        """Full-text search served by the node_text index (see db/indexes.py), ranked by textScore"""
+        text_filter = {'$text': {'$search': query}}
+        projection: Dict[str, Any] = {field: 1 for field in SEARCH_RESULT_FIELDS if field != 'id'}
+        projection['score'] = {'$meta': 'textScore'}
+        cursor = self.collection.find(text_filter, projection).sort([('score', {'$meta': 'textScore'})]).skip(skip).limit(limit)
+        hits, total = await asyncio.gather(cursor.to_list(length=limit), self.collection.count_documents(text_filter))
+        return [from_db_node(document) for document in hits], total
+
+    async def _save(self, node: Dict[str, Any]) -> bool:
+        document = to_db_node(node)
+        result = await self.collection.replace_one({'_id': document['_id']}, document, upsert=True)
+        return result.acknowledged
+
+    async def _save_many(self, nodes: List[Dict[str, Any]], write_concern: Optional[WriteConcern]) -> None:
+        collection = self.collection.with_options(write_concern=write_concern) if write_concern else self.collection
+        await collection.bulk_write(
+            [ReplaceOne({'_id': document['_id']}, document, upsert=True) for document in map(to_db_node, nodes)],
+            ordered=False
+        )
+
+    async def _update(self, node_id: str, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        document = await self.collection.find_one_and_update(
+            id_filter(node_id),
+            {'$set': fields},
+            return_document=ReturnDocument.AFTER
+        )
+        return from_db_node(document) if document is not None else None
+
+    async def _delete(self, node_id: str) -> Optional[str]:
+        document = await self.collection.find_one_and_delete(id_filter(node_id), {'_id': 1})
+        return from_db_node(document)['id'] if document is not None else None
@@ -0,0 +1,115 @@
+from typing import Any, Dict, List
+import asyncio
+import logging
+import os
+from dotenv import load_dotenv
+from pymongo.write_concern import WriteConcern
+
+from db.find_history import get_lineage, prepare_node
+from db.repository import NodeRepository
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Write concern of round flushes: "majority" waits for replication, "1" for the primary only
+NODE_WRITE_CONCERN = os.getenv("NODE_WRITE_CONCERN", "majority")
+NODE_WRITE_JOURNAL = os.getenv("NODE_WRITE_JOURNAL", "true").lower() in ("1", "true", "yes")
+# Nodes buffered before a flush starts without waiting for the end of the round
+NODE_WRITE_BATCH_SIZE = int(os.getenv("NODE_WRITE_BATCH_SIZE", "50"))
+
+
+def _write_concern(w: str, journal: bool) -> WriteConcern:
+    return WriteConcern(w=int(w) if w.isdigit() else w, j=journal)
+
+
+class RoundWriter:
+    """
+    Write-behind buffer for the nodes produced in one round
+
+    Nodes are added without touching the database and written together with one
+    unordered bulk_write, so solving and streaming never wait on Mongo.
+    """
+
+    def __init__(
+        self,
+        repository: NodeRepository,
+        write_concern: str = NODE_WRITE_CONCERN,
+        journal: bool = NODE_WRITE_JOURNAL,
+        batch_size: int = NODE_WRITE_BATCH_SIZE
+    ):
+        """
+        Initialize the writer
+
+        Args:
+            repository: Node data access
+            write_concern: Write concern "w" value of the bulk writes
+            journal: Whether bulk writes wait for the on-disk journal
+            batch_size: Buffered nodes that trigger an early background flush
+        """
+        self.repository = repository
+        self.write_concern = _write_concern(write_concern, journal)
+        self.batch_size = batch_size
+        self._buffer: List[Dict[str, Any]] = []
+        self._flushes: List[asyncio.Task] = []
+        self.persisted: List[str] = []
+        self.failed: List[str] = []
+
+    @property
+    def pending(self) -> bool:
+        """Whether nodes are buffered or still being written"""
+        return bool(self._buffer) or any(not task.done() for task in self._flushes)
+
+    def add(self, solution_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Buffer a node for the next flush
+
+        Args:
+            solution_data: Node document; a prepared copy is buffered
+
+        Returns:
+            Dict[str, Any]: The buffered document with its id and root_id set
+        """
+        document = prepare_node(dict(solution_data))
+        self._buffer.append(document)
+        if len(self._buffer) >= self.batch_size:
+            self._flushes.append(asyncio.create_task(self._write(self._take())))
+        return document
+
+    def _take(self) -> List[Dict[str, Any]]:
+        documents, self._buffer = self._buffer, []
+        return documents
+
+    async def _write(self, documents: List[Dict[str, Any]]) -> None:
+        ids = [document['id'] for document in documents]
+        try:
+            for document in documents:
+                if 'ancestors' not in document:
+                    document.update(await get_lineage(document.get('parent_id'), self.repository))
+                    document['root_id'] = document['root_id'] or document['id']
+            await self.repository.save_many(documents, self.write_concern)
+            self.persisted.extend(ids)
+            logger.info(f"Persisted {len(ids)} nodes")
+        except Exception as e:
+            self.failed.extend(ids)
+            logger.error(f"Error persisting {len(ids)} nodes: {str(e)}")
+            raise
+
+    async def flush(self) -> List[str]:
+        """
+        Write every buffered node and wait for earlier background flushes
+
+        Returns:
+            List[str]: Ids of all nodes persisted by this writer so far
+
+        Raises:
+            Exception: The first write error; failed ids are kept in self.failed
+        """
+        if self._buffer:
+            self._flushes.append(asyncio.create_task(self._write(self._take())))
+        flushes, self._flushes = self._flushes, []
+        results = await asyncio.gather(*flushes, return_exceptions=True)
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            raise errors[0]
+        return list(self.persisted)
@@ -0,0 +1,207 @@
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from collections import defaultdict
+import heapq
+import html
+import math
+import os
+import re
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Relative weight of a match per field; shared with the Mongo text index (db/indexes.py)
+SEARCH_FIELD_WEIGHTS: Dict[str, int] = {
+    'title': 10,
+    'objective': 5,
+    'description': 5,
+    'problem': 3,
+    'follow_up_question': 3,
+    'solution': 1,
+    'solution_preview': 1
+}
+
+# Fields returned per search hit; full solution bodies are left out
+SEARCH_RESULT_FIELDS = (
+    'id', 'title', 'objective', 'description', 'problem', 'follow_up_question', 'solution_preview',
+    'priority', 'parent_id', 'root_id', 'depth', 'created_at'
+)
+
+SEARCH_MAX_PAGE_SIZE = int(os.getenv("SEARCH_MAX_PAGE_SIZE", "100"))
+SNIPPET_CHARS = int(os.getenv("SEARCH_SNIPPET_CHARS", "200"))
+
+STOP_WORDS = frozenset(
+    "a an and are as at be by can do for from how i in is it of on or that the this to what when where which "
+    "who why with you your".split()
+)
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def stem(token: str) -> str:
+    """Strip common English suffixes so that e.g. 'indexes' and 'indexing' match 'index'"""
+    for suffix in ('ing', 'es', 'ed', 's'):
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            return token[:-len(suffix)]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased, stemmed terms of a text without stop words"""
+    return [stem(token) for token in _TOKEN.findall(text.lower()) if token not in STOP_WORDS]
+
+
+def parse_query(query: str) -> Tuple[List[str], Set[str]]:
+    """
+    Terms of a search query, Mongo $text style: any term may match, and terms
+    prefixed with '-' exclude the nodes that contain them
+
+    Returns:
+        Tuple[List[str], Set[str]]: Wanted terms and excluded terms
+    """
+    wanted: List[str] = []
+    excluded: Set[str] = set()
+    for word in query.split():
+        terms = tokenize(word.lstrip('-'))
+        if word.startswith('-'):
+            excluded.update(terms)
+        else:
+            wanted.extend(term for term in terms if term not in wanted)
+    return wanted, excluded
+
+
+def _searchable(node: Dict[str, Any]) -> Iterable[Tuple[str, str]]:
+    for field in SEARCH_FIELD_WEIGHTS:
+        # The preview repeats the start of the solution, only index it when the body is missing
+        if field == 'solution_preview' and isinstance(node.get('solution'), str):
+            continue
+        if isinstance(node.get(field), str):
+            yield field, node[field]
+
+
+class InvertedIndex:
+    """
+    In-process inverted index over the text fields of nodes
+
+    Search fallback of the stores that are not backed by Mongo. Hits are ranked
+    with BM25 over the field-weighted term frequencies (SEARCH_FIELD_WEIGHTS),
+    so a title match outranks the same word deep in a solution.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        """
+        Initialize an empty index
+
+        Args:
+            k1: Term frequency saturation
+            b: Strength of the document length normalization
+        """
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[str, float]] = defaultdict(dict)
+        self._terms: Dict[str, List[str]] = {}
+        self._lengths: Dict[str, float] = {}
+        self._total_length = 0.0
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def add(self, node: Dict[str, Any]) -> None:
+        """Index (or re-index) a node in its API form"""
+        node_id = node['id']
+        self.remove(node_id)
+        frequencies: Dict[str, float] = defaultdict(float)
+        length = 0.0
+        for field, text in _searchable(node):
+            weight = SEARCH_FIELD_WEIGHTS[field]
+            for term in tokenize(text):
+                frequencies[term] += weight
+                length += weight
+        for term, frequency in frequencies.items():
+            self._postings[term][node_id] = frequency
+        self._terms[node_id] = list(frequencies)
+        self._lengths[node_id] = length
+        self._total_length += length
+
+    def remove(self, node_id: str) -> None:
+        length = self._lengths.pop(node_id, None)
+        if length is None:
+            return
+        self._total_length -= length
+        for term in self._terms.pop(node_id):
+            del self._postings[term][node_id]
+            if not self._postings[term]:
+                del self._postings[term]
+
+    def search(self, query: str, limit: int, skip: int = 0) -> Tuple[List[Tuple[str, float]], int]:
+        """
+        Rank the nodes matching a query
+
+        Args:
+            query: Search terms, see parse_query
+            limit: Hits returned
+            skip: Hits skipped before the first one returned
+
+        Returns:
+            Tuple[List[Tuple[str, float]], int]: The (node id, score) page, best
+            first, and the number of matching nodes
+        """
+        wanted, excluded = parse_query(query)
+        if not wanted or not self._lengths:
+            return [], 0
+        average = self._total_length / len(self._lengths) or 1.0
+        scores: Dict[str, float] = defaultdict(float)
+        for term in wanted:
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (len(self._lengths) - len(postings) + 0.5) / (len(postings) + 0.5))
+            for node_id, frequency in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[node_id] / average)
+                scores[node_id] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+        for term in excluded:
+            for node_id in self._postings.get(term, {}):
+                scores.pop(node_id, None)
+        # Only the hits up to the requested page are ordered
+        ranked = heapq.nsmallest(skip + limit, scores.items(), key=lambda hit: (-hit[1], hit[0]))
+        return ranked[skip:], len(scores)
+
+
+def snippet(node: Dict[str, Any], query: str, chars: int = SNIPPET_CHARS, mark: Tuple[str, str] = ('<mark>', '</mark>')) -> Optional[Dict[str, str]]:
+    """
+    Highlighted excerpt of the highest weighted field of a node that matches a query
+
+    Args:
+        node: Search hit
+        query: Search terms
+        chars: Length of the excerpt around the first match
+        mark: Markers put around every matched word
+
+    Returns:
+        Optional[Dict[str, str]]: The 'field' the excerpt is from and its 'text', or
+        None when no field matches. Node text comes from users and the LLM, so
+        'text' is HTML-escaped; only the markers are left as markup.
+    """
+    wanted, _ = parse_query(query)
+    if not wanted:
+        return None
+    # A word matches a term when it starts with it, which covers the stemmed suffixes
+    pattern = re.compile(r"\b(?:" + "|".join(re.escape(term) for term in wanted) + r")\w*", re.IGNORECASE)
+    for field, text in sorted(_searchable(node), key=lambda item: -SEARCH_FIELD_WEIGHTS[item[0]]):
+        match = pattern.search(text)
+        if match is None:
+            continue
+        start = max(0, match.start() - chars // 4)
+        end = min(len(text), start + chars)
+        # Escaped piece by piece: matching after escaping would also hit entity names such as 'amp'
+        excerpt, last = [], start
+        for word in pattern.finditer(text, start, end):
+            excerpt.append(html.escape(text[last:word.start()]))
+            excerpt.append(f"{mark[0]}{html.escape(word.group(0))}{mark[1]}")
+            last = word.end()
+        excerpt.append(html.escape(text[last:end]))
+        excerpt = ''.join(excerpt)
+        return {
+            'field': field,
+            'text': ('...' if start > 0 else '') + excerpt + ('...' if end < len(text) else '')
+        }
+    return None
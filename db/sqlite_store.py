@@ -0,0 +1,260 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+import asyncio
+import os
+import sqlite3
+import threading
+import zlib
+from bson import json_util
+from dotenv import load_dotenv
+from pymongo.write_concern import WriteConcern
+from db.node_ids import (
+    NODE_COMPRESS_LEVEL,
+    NODE_COMPRESS_MIN_BYTES,
+    NODE_COMPRESS_SOLUTION,
+    canonical_id,
+    solution_preview
+)
+from db.repository import NodeRepository, project
+from db.search import SEARCH_FIELD_WEIGHTS, SEARCH_RESULT_FIELDS, InvertedIndex
+
+load_dotenv()
+
+NODE_SQLITE_PATH = os.getenv("NODE_SQLITE_PATH", "nodetree.db")
+
+T = TypeVar("T")
+
+# Every field of a node but its id and solution body is kept as Extended JSON in
+# 'document'; the columns next to it copy the fields that are queried or sorted on.
+# node_ancestors is the closure of the materialized paths: one row per node and
+# ancestor, carrying the depth of the node, so a subtree is one index range.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS nodes (
+    id TEXT PRIMARY KEY,
+    parent_id TEXT,
+    root_id TEXT,
+    depth INTEGER NOT NULL DEFAULT 0,
+    priority INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT,
+    document TEXT NOT NULL,
+    solution BLOB
+);
+CREATE INDEX IF NOT EXISTS nodes_parent_id_priority_created_at ON nodes (parent_id, priority DESC, created_at);
+CREATE INDEX IF NOT EXISTS nodes_root_id_depth ON nodes (root_id, depth);
+CREATE INDEX IF NOT EXISTS nodes_priority_created_at ON nodes (priority DESC, created_at DESC);
+CREATE INDEX IF NOT EXISTS nodes_created_at ON nodes (created_at DESC);
+CREATE TABLE IF NOT EXISTS node_ancestors (
+    ancestor_id TEXT NOT NULL,
+    depth INTEGER NOT NULL,
+    node_id TEXT NOT NULL,
+    PRIMARY KEY (ancestor_id, depth, node_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS node_ancestors_node_id ON node_ancestors (node_id);
+"""
+
+# Follows parent_id upwards; the hop bound also stops a corrupted cyclic chain
+ANCESTORS_QUERY = """
+WITH RECURSIVE chain (id, hops) AS (
+    SELECT id, 0 FROM nodes WHERE id = ?
+    UNION ALL
+    SELECT nodes.parent_id, chain.hops + 1 FROM chain JOIN nodes ON nodes.id = chain.id
+    WHERE nodes.parent_id IS NOT NULL AND chain.hops < ?
+)
+SELECT nodes.id, nodes.document, {solution} FROM chain JOIN nodes ON nodes.id = chain.id ORDER BY chain.hops
+"""
+
+SUBTREE_QUERY = """
+SELECT nodes.id, nodes.document, {solution}
+FROM node_ancestors JOIN nodes ON nodes.id = node_ancestors.node_id
+WHERE node_ancestors.ancestor_id = ? AND node_ancestors.depth <= ?
+ORDER BY node_ancestors.depth, nodes.created_at
+"""
+
+# Stands in for "no limit" in depth bounds
+UNBOUNDED_DEPTH = 1 << 31
+
+
+def _reads_solution(projection: Optional[Dict[str, Any]]) -> bool:
+    if not projection:
+        return True
+    if any(projection.values()):
+        return bool(projection.get('solution'))
+    return 'solution' not in projection
+
+
+def _to_row(node: Dict[str, Any]) -> Tuple[Any, ...]:
+    document = {field: value for field, value in node.items() if field not in ('id', 'solution')}
+    solution = node.get('solution')
+    if isinstance(solution, str):
+        document.setdefault('solution_preview', solution_preview(solution))
+        raw = solution.encode('utf-8')
+        if NODE_COMPRESS_SOLUTION and len(raw) >= NODE_COMPRESS_MIN_BYTES:
+            # Compressed bodies are stored as BLOB, plain ones as TEXT
+            solution = zlib.compress(raw, NODE_COMPRESS_LEVEL)
+    elif solution is not None:
+        document['solution'] = solution
+        solution = None
+    created_at = node.get('created_at')
+    return (
+        canonical_id(node['id']),
+        node.get('parent_id'),
+        node.get('root_id'),
+        node.get('depth', 0),
+        node.get('priority', 0),
+        created_at.isoformat() if hasattr(created_at, 'isoformat') else created_at,
+        json_util.dumps(document),
+        solution
+    )
+
+
+def _from_row(row: Tuple[Any, ...]) -> Dict[str, Any]:
+    node_id, document, solution = row
+    node = {'id': node_id, **json_util.loads(document)}
+    if isinstance(solution, bytes):
+        solution = zlib.decompress(solution).decode('utf-8')
+    if solution is not None:
+        node['solution'] = solution
+    return node
+
+
+class SQLiteNodeRepository(NodeRepository):
+    """
+    Nodes in an embedded SQLite database file
+
+    For local runs and small single-host deployments. sqlite3 is blocking, so
+    every statement runs in a worker thread on one connection, serialized by a
+    lock; SQLite allows a single writer at a time anyway.
+
+    Search is served by an in-process inverted index, built from the table on
+    the first search and kept current by this repository's writes afterwards;
+    writes by other processes are not seen until a restart. It is only used
+    under the connection lock, in the worker threads.
+    """
+
+    def __init__(self, path: str = NODE_SQLITE_PATH):
+        """
+        Open (and create if needed) the database
+
+        Args:
+            path: Database file, ":memory:" for a private in-memory database
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        if path != ":memory:":
+            # Readers do not block the writer, and commits do not wait for a full fsync
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(SCHEMA)
+        self._text: Optional[InvertedIndex] = None
+
+    async def _run(self, operation: Callable[[sqlite3.Connection], T]) -> T:
+        def locked() -> T:
+            with self._lock:
+                return operation(self._connection)
+        return await asyncio.to_thread(locked)
+
+    async def find(self, node_id: str, projection: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        node_id = canonical_id(node_id)
+        solution = 'solution' if _reads_solution(projection) else 'NULL'
+        row = await self._run(lambda connection: connection.execute(
+            f"SELECT id, document, {solution} FROM nodes WHERE id = ?", (node_id,)
+        ).fetchone())
+        return project(_from_row(row), projection) if row is not None else None
+
+    async def find_with_ancestors(
+        self,
+        node_id: str,
+        max_depth: Optional[int] = None,
+        fields: Optional[Tuple[str, ...]] = None
+    ) -> List[Dict[str, Any]]:
+        node_id = canonical_id(node_id)
+        projection = {field: 1 for field in fields} if fields is not None else None
+        query = ANCESTORS_QUERY.format(solution='nodes.solution' if _reads_solution(projection) else 'NULL')
+        hops = max_depth if max_depth is not None else UNBOUNDED_DEPTH
+        rows = await self._run(lambda connection: connection.execute(query, (node_id, hops)).fetchall())
+        return [project(_from_row(row), projection) for row in rows]
+
+    async def find_subtree(
+        self,
+        node: Dict[str, Any],
+        max_depth: Optional[int] = None,
+        projection: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        query = SUBTREE_QUERY.format(solution='nodes.solution' if _reads_solution(projection) else 'NULL')
+        deepest = node.get('depth', 0) + max_depth if max_depth is not None else UNBOUNDED_DEPTH
+        rows = await self._run(lambda connection: connection.execute(query, (node['id'], deepest)).fetchall())
+        return [project(_from_row(row), projection) for row in rows]
+
+    async def search(self, query: str, limit: int = 20, skip: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+        def search(connection: sqlite3.Connection) -> Tuple[List[Dict[str, Any]], int]:
+            if self._text is None:
+                self._text = InvertedIndex()
+                for row in connection.execute("SELECT id, document, solution FROM nodes"):
+                    self._text.add(_from_row(row))
+            ranked, total = self._text.search(query, limit, skip)
+            if not ranked:
+                return [], total
+            node_ids = [node_id for node_id, _ in ranked]
+            rows = connection.execute(
+                f"SELECT id, document, NULL FROM nodes WHERE id IN ({', '.join('?' * len(node_ids))})", node_ids
+            ).fetchall()
+            projection = {field: 1 for field in SEARCH_RESULT_FIELDS}
+            found = {row[0]: project(_from_row(row), projection) for row in rows}
+            return [{**found[node_id], 'score': score} for node_id, score in ranked if node_id in found], total
+
+        return await self._run(search)
+
+    def _write(self, connection: sqlite3.Connection, nodes: List[Dict[str, Any]], reindex: bool = True) -> None:
+        rows = [_to_row(node) for node in nodes]
+        with connection:
+            connection.executemany("INSERT OR REPLACE INTO nodes VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            connection.executemany("DELETE FROM node_ancestors WHERE node_id = ?", [(row[0],) for row in rows])
+            connection.executemany(
+                "INSERT OR IGNORE INTO node_ancestors VALUES (?, ?, ?)",
+                [
+                    (ancestor, row[3], row[0])
+                    for node, row in zip(nodes, rows)
+                    for ancestor in node.get('ancestors', [])
+                ]
+            )
+        # Under the connection lock, like every other use of the index
+        if reindex and self._text is not None:
+            for node, row in zip(nodes, rows):
+                self._text.add({**node, 'id': row[0]})
+
+    async def _save(self, node: Dict[str, Any]) -> bool:
+        await self._run(lambda connection: self._write(connection, [node]))
+        return True
+
+    async def _save_many(self, nodes: List[Dict[str, Any]], write_concern: Optional[WriteConcern]) -> None:
+        if nodes:
+            await self._run(lambda connection: self._write(connection, nodes))
+
+    async def _update(self, node_id: str, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        node_id = canonical_id(node_id)
+
+        def update(connection: sqlite3.Connection) -> Optional[Dict[str, Any]]:
+            row = connection.execute("SELECT id, document, solution FROM nodes WHERE id = ?", (node_id,)).fetchone()
+            if row is None:
+                return None
+            node = {**_from_row(row), **fields}
+            self._write(connection, [node], reindex=any(field in SEARCH_FIELD_WEIGHTS for field in fields))
+            return node
+
+        return await self._run(update)
+
+    async def _delete(self, node_id: str) -> Optional[str]:
+        node_id = canonical_id(node_id)
+
+        def delete(connection: sqlite3.Connection) -> Optional[str]:
+            with connection:
+                deleted = connection.execute("DELETE FROM nodes WHERE id = ?", (node_id,)).rowcount
+                connection.execute("DELETE FROM node_ancestors WHERE node_id = ?", (node_id,))
+            if deleted and self._text is not None:
+                self._text.remove(node_id)
+            return node_id if deleted else None
+
+        return await self._run(delete)
+
+    async def close(self) -> None:
+        await self._run(lambda connection: connection.close())
@@ -1,15 +1,23 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
-from db.database import connect_to_mongo, close_mongo_connection, get_client
+from db.database import NODE_STORE, close_store, connect_store, get_client, get_repository
+from agents.llm_cache import completion_cache
+from agents.llm_coalesce import single_flight
+from agents.llm_ratelimit import rate_limiter
+from agents.llm_retry import resilient_caller
+from db.indexes import explain_hot_queries
+from db.node_cache import node_cache
+from rag.retrieval import retriever
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # 启动前连接数据库
-    await connect_to_mongo()
+    await connect_store()
     yield
     # 关闭时断开连接
-    await close_mongo_connection()
+    await close_store()
+    retriever.shutdown()
 
 app = FastAPI(
     title="nodetree backend",
@@ -55,8 +63,37 @@ async def root():
 
 @app.get("/db-test")
 async def db():
+    get_repository()
+    return {"message": f"Connected to the {NODE_STORE} node store"}
+
+@app.get("/llm-stats")
+async def llm_stats():
+    return {
+        "cache": completion_cache.stats(),
+        "coalescing": single_flight.stats(),
+        "rate_limits": rate_limiter.stats(),
+        "resilience": resilient_caller.stats(),
+        "retrieval": retriever.stats()
+    }
+
+@app.get("/db-stats")
+async def db_stats():
+    return {
+        "store": NODE_STORE,
+        "node_cache": node_cache.stats()
+    }
+
+@app.get("/db-diagnostics")
+async def db_diagnostics():
+    if NODE_STORE != "mongo":
+        return {"store": NODE_STORE, "indexes": [], "collscans": [], "queries": []}
     client = get_client()
-    return {"message": "Connected to MongoDB"}
+    report = await explain_hot_queries(client)
+    return {
+        "indexes": sorted(await client['nodetree']['nodes'].index_information()),
+        "collscans": [row['query'] for row in report if row.get('collscan')],
+        "queries": report
+    }
 
 if __name__ == "__main__":
     import uvicorn
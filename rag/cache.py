@@ -0,0 +1,281 @@
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+from collections import OrderedDict
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+RAG_CACHE_ENABLED = os.getenv("RAG_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+RAG_EMBEDDING_CACHE_MAX_BYTES = int(os.getenv("RAG_EMBEDDING_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+# A query always embeds to the same vector, so embeddings can be kept much longer than results
+RAG_EMBEDDING_CACHE_TTL = float(os.getenv("RAG_EMBEDDING_CACHE_TTL", "86400"))
+RAG_RESULT_CACHE_MAX_BYTES = int(os.getenv("RAG_RESULT_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+RAG_RESULT_CACHE_TTL = float(os.getenv("RAG_RESULT_CACHE_TTL", "600"))
+# Touched on every ingestion so that other processes drop their cached results too
+RAG_CACHE_MARKER = os.getenv("RAG_CACHE_MARKER", "rag/Chroma/.generation")
+
+Documents = List[Tuple[Dict[str, Any], str]]
+
+_SPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Query text with case, Unicode form, whitespace and trailing punctuation normalized"""
+    text = _SPACE.sub(" ", unicodedata.normalize("NFKC", query).casefold()).strip()
+    return text.rstrip("?!. ")
+
+
+class EmbeddingCache:
+    """
+    Byte-bounded LRU of query embeddings
+
+    Vectors are float32 rows of one preallocated matrix sized to max_bytes when
+    the first vector arrives; entries only hold their row number.
+    """
+
+    def __init__(self, max_bytes: int = RAG_EMBEDDING_CACHE_MAX_BYTES, ttl: float = RAG_EMBEDDING_CACHE_TTL):
+        """
+        Initialize the cache
+
+        Args:
+            max_bytes: Size of the vector matrix
+            ttl: Seconds an embedding is served
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._rows: "OrderedDict[Hashable, Tuple[float, int]]" = OrderedDict()
+        self._vectors: Optional[np.ndarray] = None
+        self._free: List[int] = []
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[np.ndarray]:
+        """Copy of a cached vector, or None"""
+        entry = self._rows.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+        self._rows.move_to_end(key)
+        self.hits += 1
+        return self._vectors[entry[1]].copy()
+
+    def put(self, key: Hashable, vector: Any) -> None:
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        if self._vectors is None or self._vectors.shape[1] != vector.shape[0]:
+            # First vector, or another embedding model: size the matrix for this dimension
+            capacity = self.max_bytes // (vector.shape[0] * 4)
+            if capacity < 1:
+                return
+            self.clear()
+            self._vectors = np.empty((capacity, vector.shape[0]), dtype=np.float32)
+            self._free = list(range(capacity - 1, -1, -1))
+        self._remove(key)
+        if not self._free:
+            evicted = next(iter(self._rows))
+            self._remove(evicted)
+            self.evictions += 1
+        row = self._free.pop()
+        self._vectors[row] = vector
+        self._rows[key] = (time.monotonic() + self.ttl, row)
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._rows.pop(key, None)
+        if entry is not None:
+            self._free.append(entry[1])
+
+    def clear(self) -> None:
+        self._rows.clear()
+        self._vectors = None
+        self._free = []
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._rows),
+            "bytes": self._vectors.nbytes if self._vectors is not None else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+
+class ResultCache:
+    """Byte-bounded LRU of retrieval results, tagged with the collection generation they were read at"""
+
+    def __init__(self, max_bytes: int = RAG_RESULT_CACHE_MAX_BYTES, ttl: float = RAG_RESULT_CACHE_TTL):
+        """
+        Initialize the cache
+
+        Args:
+            max_bytes: Upper bound of the estimated size of all cached results
+            ttl: Seconds results are served
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, Hashable, int, Documents]]" = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, generation: Hashable) -> Optional[Documents]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic() or entry[1] != generation:
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return list(entry[3])
+
+    def put(self, key: Hashable, generation: Hashable, documents: Documents) -> None:
+        size = sum(len(content) + len(repr(metadata)) for metadata, content in documents)
+        self._remove(key)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, generation, size, list(documents))
+        self.size += size
+        while self.size > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[2]
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+
+class RetrievalCache:
+    """
+    Two-level cache in front of similarity search
+
+    Level one maps the normalized query text (per embedding model) to its
+    embedding, so repeated queries skip the embedding API. Level two maps
+    (embedding, k, filter) to the retrieved documents. Results are tagged with
+    the collection generation: invalidate(), called whenever documents are
+    ingested, bumps it here and touches a marker file so other processes see
+    it too. Query embeddings do not depend on the collection and are kept.
+    Safe to use from several threads.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = RAG_CACHE_ENABLED,
+        embeddings: Optional[EmbeddingCache] = None,
+        results: Optional[ResultCache] = None,
+        marker: str = RAG_CACHE_MARKER
+    ):
+        """
+        Initialize the cache
+
+        Args:
+            enabled: When False nothing is cached
+            embeddings: Level one, a default EmbeddingCache when None
+            results: Level two, a default ResultCache when None
+            marker: File whose modification time is part of the generation
+        """
+        self.enabled = enabled
+        self.embeddings = embeddings or EmbeddingCache()
+        self.results = results or ResultCache()
+        self.marker = marker
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def generation(self) -> Tuple[int, int]:
+        try:
+            stamp = os.stat(self.marker).st_mtime_ns
+        except OSError:
+            stamp = 0
+        return self._generation, stamp
+
+    @staticmethod
+    def result_key(vector: np.ndarray, k: int, filter: Optional[Dict[str, Any]] = None) -> Tuple[str, int, str]:
+        digest = hashlib.blake2b(np.ascontiguousarray(vector, dtype=np.float32).tobytes(), digest_size=16).hexdigest()
+        return digest, k, json.dumps(filter, sort_keys=True, default=str) if filter else ""
+
+    def get_embedding(self, model: str, query: str) -> Optional[np.ndarray]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            return self.embeddings.get((model, normalize_query(query)))
+
+    def put_embedding(self, model: str, query: str, vector: Any) -> None:
+        if self.enabled:
+            with self._lock:
+                self.embeddings.put((model, normalize_query(query)), vector)
+
+    def get_results(self, vector: np.ndarray, k: int, filter: Optional[Dict[str, Any]] = None) -> Optional[Documents]:
+        if not self.enabled:
+            return None
+        generation = self.generation()
+        with self._lock:
+            return self.results.get(self.result_key(vector, k, filter), generation)
+
+    def put_results(
+        self,
+        vector: np.ndarray,
+        k: int,
+        filter: Optional[Dict[str, Any]],
+        documents: Documents,
+        generation: Tuple[int, int]
+    ) -> None:
+        """
+        Cache documents retrieved for (vector, k, filter)
+
+        Args:
+            generation: generation() read before the search, so results of a
+                search that raced an ingestion are never served as current
+        """
+        if self.enabled:
+            with self._lock:
+                self.results.put(self.result_key(vector, k, filter), generation, documents)
+
+    def invalidate(self) -> None:
+        """Drop every cached result, here and, through the marker file, in other processes"""
+        with self._lock:
+            self._generation += 1
+            self.results.clear()
+        try:
+            os.makedirs(os.path.dirname(self.marker) or ".", exist_ok=True)
+            with open(self.marker, "a"):
+                os.utime(self.marker)
+        except OSError as e:
+            logger.warning(f"Could not touch the retrieval cache marker {self.marker}: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "generation": self._generation,
+                "embeddings": self.embeddings.stats(),
+                "results": self.results.stats()
+            }
+
+
+retrieval_cache = RetrievalCache()
@@ -1,3 +1,4 @@
+import sys
 from langchain.vectorstores import Chroma
 
 # Define path to existing Chroma database
@@ -6,20 +7,19 @@ CHROMA_PATH = "rag/Chroma"  # Update if necessary
 # Load the existing Chroma database
 db = Chroma(persist_directory=CHROMA_PATH)
 
-# Fetch all stored metadata and associated documents
-all_data = db._collection.get(include=["metadatas", "documents"])
-
 # Check the number of stored chunks/vectors
-print(f"Total stored chunks: {len(all_data['metadatas'])}")
+total = db._collection.count()
+print(f"Total stored chunks: {total}")
 
 # Choose a specific chunk index (e.g., first chunk)
-chunk_index = 1000  # Change this to test other chunks
+chunk_index = int(sys.argv[1]) if len(sys.argv) > 1 else 1000  # Pass another index to test other chunks
 
-# Verify metadata retrieval
-if chunk_index < len(all_data["metadatas"]):
-    metadata = all_data["metadatas"][chunk_index]
-    document = all_data["documents"][chunk_index]
+# Verify metadata retrieval; only the chosen chunk is read, not the whole collection
+if chunk_index < total:
+    chunk = db._collection.get(limit=1, offset=chunk_index, include=["metadatas", "documents"])
+    metadata = chunk["metadatas"][0]
+    document = chunk["documents"][0]
     print(f"Metadata for Chunk {chunk_index + 1}: {metadata}")
     print(f"Document Snippet: {document[:200]}...")  # Print first 200 characters for context
 else:
-    print("Chunk index out of range.")
\ No newline at end of file
+    print("Chunk index out of range.")
@@ -0,0 +1,161 @@
+from typing import Any, Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import logging
+import os
+import time
+from dotenv import load_dotenv
+from rag.cache import retrieval_cache
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+RAG_ENABLED = os.getenv("RAG_ENABLED", "true").lower() in ("1", "true", "yes")
+# Threads running retrievals; the embedding call and the Chroma query both block
+RAG_MAX_WORKERS = int(os.getenv("RAG_MAX_WORKERS", "4"))
+# Retrievals waiting for or holding a thread before new ones are skipped
+RAG_MAX_PENDING = int(os.getenv("RAG_MAX_PENDING", "32"))
+# Seconds a round waits for its documents, counted from the start of the retrieval
+RAG_TIMEOUT = float(os.getenv("RAG_TIMEOUT", "3.0"))
+
+Documents = List[Tuple[Dict[str, Any], str]]
+
+
+def _search(queries: List[str], k: int) -> List[Documents]:
+    # rag.run creates the embeddings client and opens the vector store on first search
+    from rag.run import search_documents_batch
+    return search_documents_batch(queries, k=k)
+
+
+class Retriever:
+    """
+    Runs document retrieval off the event loop, in a bounded thread pool
+
+    Retrieved documents are optional context: a retrieval that fails, times out
+    or finds the pool saturated yields no documents instead of an error, so it
+    never holds up or breaks a round.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = RAG_MAX_WORKERS,
+        max_pending: int = RAG_MAX_PENDING,
+        timeout: float = RAG_TIMEOUT,
+        enabled: bool = RAG_ENABLED
+    ):
+        """
+        Initialize the retriever
+
+        Args:
+            max_workers: Threads running retrievals
+            max_pending: Retrievals in the pool (running or queued) before new ones are skipped
+            timeout: Seconds a caller waits for a retrieval
+            enabled: When False no documents are retrieved
+        """
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.enabled = enabled
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.pending = 0
+        self.completed = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.skipped = 0
+        self._latency = 0.0
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="rag")
+        return self._executor
+
+    async def search(self, query: str, k: int = 2, timeout: Optional[float] = None) -> Documents:
+        """
+        Retrieve the documents most similar to a query
+
+        Args:
+            query: Search text
+            k: Number of documents
+            timeout: Seconds to wait, the retriever's timeout when None
+
+        Returns:
+            Documents: (metadata, content) pairs, most similar first; empty when
+            retrieval is disabled, saturated, failed or timed out
+        """
+        return (await self.search_many([query], k, timeout))[0]
+
+    async def search_many(self, queries: List[str], k: int = 2, timeout: Optional[float] = None) -> List[Documents]:
+        """
+        Retrieve the documents most similar to each of several queries in one
+        batch: one embedding call and one vector query for all of them
+
+        Args:
+            queries: Search texts
+            k: Number of documents per query
+            timeout: Seconds to wait, the retriever's timeout when None
+
+        Returns:
+            List[Documents]: Per query, in order, its documents; all empty when
+            retrieval is disabled, saturated, failed or timed out
+        """
+        empty: List[Documents] = [[] for _ in queries]
+        if not self.enabled or k <= 0 or not any(queries):
+            return empty
+        if self.pending >= self.max_pending:
+            self.skipped += 1
+            logger.warning("Document retrieval skipped, the retrieval pool is saturated")
+            return empty
+
+        started = time.perf_counter()
+        self.pending += 1
+        future = asyncio.get_running_loop().run_in_executor(self._pool(), _search, list(queries), k)
+
+        def release(done: asyncio.Future) -> None:
+            self.pending -= 1
+            if not done.cancelled():
+                # Marks the error of a retrieval nobody waits for anymore as seen
+                done.exception()
+        # A retrieval that timed out keeps its slot until its thread is done
+        future.add_done_callback(release)
+
+        try:
+            documents = await asyncio.wait_for(asyncio.shield(future), timeout if timeout is not None else self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            logger.warning(f"Document retrieval timed out after {time.perf_counter() - started:.2f}s")
+            return empty
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Error retrieving documents: {str(e)}")
+            return empty
+
+        self.completed += 1
+        self._latency += time.perf_counter() - started
+        return documents
+
+    def start(self, query: str, k: int = 2) -> "asyncio.Task[Documents]":
+        """Start a retrieval in the background; awaiting the task gives its documents"""
+        return asyncio.create_task(self.search(query, k))
+
+    def stats(self) -> Dict[str, Any]:
+        """Retrieval outcomes and mean latency of the completed ones"""
+        return {
+            "enabled": self.enabled,
+            "max_workers": self.max_workers,
+            "pending": self.pending,
+            "completed": self.completed,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "skipped": self.skipped,
+            "mean_latency_ms": self._latency / self.completed * 1000 if self.completed else 0.0,
+            "cache": retrieval_cache.stats()
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+retriever = Retriever()
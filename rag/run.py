@@ -1,20 +1,17 @@
-# Langchain dependencies
-from langchain.document_loaders.pdf import PyPDFDirectoryLoader # Importing PDF loader from Langchain
-from langchain.text_splitter import RecursiveCharacterTextSplitter # Importing text splitter from Langchain
-from langchain.embeddings import OpenAIEmbeddings # Importing OpenAI embeddings from Langchain
-from langchain.schema import Document # Importing Document schema from Langchain
-from langchain.vectorstores import Chroma # Importing Chroma vector store from Langchain
+from __future__ import annotations # Document annotations are not evaluated, langchain is imported on first use
+
 from dotenv import load_dotenv # Importing dotenv to get API key from .env file
-from langchain.chat_models import ChatOpenAI # Import OpenAI LLM
 import os # Importing os module for operating system functionalities
-import shutil # Importing shutil module for high-level file operations
-import requests
-import feedparser
-import tempfile
-import PyPDF2
 import math
+import threading
+import numpy as np
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from rag.cache import retrieval_cache
 
-from rag.load_documents import load_documents
+if TYPE_CHECKING:
+  from langchain.schema import Document
+  from rag.vector_index import VectorIndex
 
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
@@ -22,17 +19,52 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 # Path to the directory to save Chroma database
 CHROMA_PATH = "rag/Chroma"
 
-# Ensure the database directory exists
-if not os.path.exists(CHROMA_PATH):
-    os.makedirs(CHROMA_PATH)  # Create the directory if it doesn't exist
-    print(f"Created directory: {CHROMA_PATH}")
-
-embeddings = OpenAIEmbeddings(
-    model="text-embedding-ada-002", 
-    disallowed_special=()  # Allow all special tokens
-)
-
-db = Chroma(persist_directory=CHROMA_PATH, embedding_function=embeddings)
+# Where search_documents looks up neighbours: "chroma" queries the Chroma collection,
+# "index" the memory-mapped export of it (python -m rag.vector_index export)
+RAG_VECTOR_STORE = os.getenv("RAG_VECTOR_STORE", "chroma").lower()
+
+EMBEDDING_MODEL = "text-embedding-ada-002"
+
+# Created on first use, so importing this module does not load langchain or open Chroma
+_embeddings = None
+_db = None
+_index: Optional[VectorIndex] = None
+_lock = threading.Lock()
+
+def get_embeddings():
+  """The OpenAI embeddings client"""
+  global _embeddings
+  with _lock:
+    if _embeddings is None:
+      from langchain.embeddings import OpenAIEmbeddings
+      _embeddings = OpenAIEmbeddings(
+          model=EMBEDDING_MODEL,
+          disallowed_special=()  # Allow all special tokens
+      )
+    return _embeddings
+
+def get_db():
+  """The Chroma vector store, created in CHROMA_PATH if needed"""
+  global _db
+  embeddings = get_embeddings()
+  with _lock:
+    if _db is None:
+      from langchain.vectorstores import Chroma
+      # Ensure the database directory exists
+      if not os.path.exists(CHROMA_PATH):
+          os.makedirs(CHROMA_PATH)  # Create the directory if it doesn't exist
+          print(f"Created directory: {CHROMA_PATH}")
+      _db = Chroma(persist_directory=CHROMA_PATH, embedding_function=embeddings)
+    return _db
+
+def get_index() -> VectorIndex:
+  """The memory-mapped vector index at RAG_INDEX_PATH"""
+  global _index
+  with _lock:
+    if _index is None:
+      from rag.vector_index import VectorIndex
+      _index = VectorIndex()
+    return _index
 
 def split_text(documents: list[Document]):
   """
@@ -43,6 +75,8 @@ def split_text(documents: list[Document]):
     list[Document]: List of Document objects representing the split text chunks.
   """
   # Initialize text splitter with specified parameters
+  from langchain.text_splitter import RecursiveCharacterTextSplitter
+
   text_splitter = RecursiveCharacterTextSplitter(
     chunk_size=300, # Size of each chunk in characters
     chunk_overlap=100, # Overlap between consecutive chunks
@@ -74,42 +108,94 @@ def save_to_chroma(chunks: list[Document], batch_size=400):
   # if os.path.exists(CHROMA_PATH):
   #   shutil.rmtree(CHROMA_PATH)
 
+  db = get_db()
   num_batches = math.ceil(len(chunks) / batch_size)
     
   for i in range(num_batches):
     batch = chunks[i * batch_size : (i + 1) * batch_size]
     db.add_documents(batch)
     db.persist()
+    # Cached retrieval results no longer reflect the collection
+    retrieval_cache.invalidate()
   print('Finish saving')
 
 def generate_data_store(query, max_results):
   """
   Function to generate vector database in chroma from documents.
   """
+  from rag.load_documents import load_documents
+
   documents = load_documents(query, max_results) # Load documents from a source
   chunks = split_text(documents) # Split documents into manageable chunks
   save_to_chroma(chunks) # Save the processed data to a data store
   # return db
 
-def search_documents(query: str, k: int = 3) -> list[tuple[dict, str]]: # with AI generated output
+def search_documents(query: str, k: int = 3, filter: Optional[Dict[str, Any]] = None) -> list[tuple[dict, str]]: # with AI generated output
     """
     Execute similarity search and return metadata and content of the most relevant documents.
 
+    Query embeddings and results are cached (see rag/cache.py): a repeated query,
+    up to case, whitespace and trailing punctuation, does not call the embedding
+    API, and the same search against an unchanged collection does not query Chroma
+    (or the vector index, with RAG_VECTOR_STORE=index).
+
     Args:
         query (str): Search query
         k (int): Number of documents to return, default is 3
+        filter (Optional[Dict[str, Any]]): Chroma metadata filter; with the vector
+            index only equality on metadata fields is supported
 
     Returns:
         list[tuple[dict, str]]: List of tuples containing (metadata, text content)
     """
-    retrieved_docs = db.similarity_search(query, k=k)
-    results = []
-    
-    for doc in retrieved_docs:
-        results.append((doc.metadata, doc.page_content))
-    
-    return results
+    return search_documents_batch([query], k, filter)[0]
+
+def search_documents_batch(queries: List[str], k: int = 3, filter: Optional[Dict[str, Any]] = None) -> List[list[tuple[dict, str]]]:
+    """
+    Similarity search for several queries with one embedding call and one Chroma
+    (or vector index) query
 
+    Queries whose embedding or results are cached (see search_documents) skip the
+    corresponding call.
+
+    Args:
+        queries (List[str]): Search queries
+        k (int): Number of documents per query
+        filter (Optional[Dict[str, Any]]): Chroma metadata filter applied to every query
+
+    Returns:
+        List[list[tuple[dict, str]]]: Per query, in order, its (metadata, text content) tuples
+    """
+    vectors: List[Optional[np.ndarray]] = [retrieval_cache.get_embedding(EMBEDDING_MODEL, query) for query in queries]
+    missing = [i for i, vector in enumerate(vectors) if vector is None]
+    if missing:
+        embedded = np.asarray(get_embeddings().embed_documents([queries[i] for i in missing]), dtype=np.float32)
+        for i, vector in zip(missing, embedded):
+            vectors[i] = vector
+            retrieval_cache.put_embedding(EMBEDDING_MODEL, queries[i], vector)
+
+    results: List[Optional[list[tuple[dict, str]]]] = [retrieval_cache.get_results(vector, k, filter) for vector in vectors]
+    missing = [i for i, found in enumerate(results) if found is None]
+    if missing:
+        generation = retrieval_cache.generation()
+        # One nearest-neighbour query for all remaining vectors
+        if RAG_VECTOR_STORE == "index":
+            found = get_index().search_many(np.stack([vectors[i] for i in missing]), k, filter)
+        else:
+            response = get_db()._collection.query(
+                query_embeddings=[vectors[i].tolist() for i in missing],
+                n_results=k,
+                where=filter,
+                include=["metadatas", "documents"]
+            )
+            found = [
+                [(metadata or {}, document) for metadata, document in zip(metadatas, documents)]
+                for metadatas, documents in zip(response["metadatas"], response["documents"])
+            ]
+        for i, documents in zip(missing, found):
+            results[i] = documents
+            retrieval_cache.put_results(vectors[i], k, filter, results[i], generation)
+    return results
 
 
 
@@ -132,5 +218,5 @@ if __name__ == "__main__":
   #                 'impact of stress on health']
   # for key in keyword_list:
   #   generate_data_store(key, 200)
-  retrieved_docs = db.similarity_search("I want to know the impact of stress on health?", k=3)
+  retrieved_docs = get_db().similarity_search("I want to know the impact of stress on health?", k=3)
   print(retrieved_docs)
\ No newline at end of file
@@ -0,0 +1,537 @@
+# Memory-mapped vector index: an alternative to querying Chroma at run time
+#
+#   python -m rag.vector_index export [--dtype float16] [--quantize int8]   # rag/Chroma -> rag/index
+#   python -m rag.vector_index info
+#   python -m rag.vector_index show 1000                   # one chunk, read without loading the others
+#   python -m rag.vector_index quantize --mode pq --subspaces 96
+#
+# An index is a directory holding
+#   manifest.json   count, dimension, dtype, embedding model, source
+#   vectors.npy     (count, dim) float32 or float16 matrix of L2-normalized embeddings
+#   offsets.npy     (count + 1) int64 byte offsets of every record in documents.bin
+#   documents.bin   concatenated UTF-8 JSON records {"metadata": ..., "content": ...}
+# and optionally compressed codes of the vectors, scanned instead of vectors.npy
+# when RAG_INDEX_QUANTIZATION selects them (see quantize):
+#   int8.npy, int8.npz   (count, dim) int8 scalar codes, per-dimension scale and offset
+#   pq.npy, pq.npz       (count, subspaces) uint8 product codes, per-subspace centroids
+# Every file is memory-mapped on open, so opening costs a few system calls
+# whatever the size of the index, and pages are read on first use.
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import argparse
+import json
+import logging
+import mmap
+import os
+import shutil
+import time
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+RAG_INDEX_PATH = os.getenv("RAG_INDEX_PATH", "rag/index")
+# Rows scored per matrix product; bounds the working memory of a search. float16
+# and int8 blocks are upcast to float32 first, which pays off while a block fits in cache
+RAG_INDEX_BLOCK_ROWS = int(os.getenv("RAG_INDEX_BLOCK_ROWS", "4096"))
+# A metadata filter is applied to this many times k best candidates, then to as many times more
+RAG_INDEX_FILTER_OVERFETCH = max(2, int(os.getenv("RAG_INDEX_FILTER_OVERFETCH", "10")))
+
+# Codes scanned by a search: "none" (the vectors themselves), "int8" or "pq"
+RAG_INDEX_QUANTIZATION = os.getenv("RAG_INDEX_QUANTIZATION", "none").lower()
+# With codes, this many times k best candidates are re-ranked on the full-precision
+# vectors; 0 ranks by the approximate scores alone
+RAG_INDEX_RERANK = int(os.getenv("RAG_INDEX_RERANK", "10"))
+
+DTYPES = ("float32", "float16")
+QUANTIZATIONS = ("none", "int8", "pq")
+# Centroids per product-quantization subspace, so that a code fits in a byte
+PQ_CENTROIDS = 256
+
+Documents = List[Tuple[Dict[str, Any], str]]
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _matches(metadata: Dict[str, Any], filter: Dict[str, Any]) -> bool:
+    return all(metadata.get(field) == value for field, value in filter.items())
+
+
+class IndexWriter:
+    """
+    Writes an index directory in one pass
+
+    Rows are streamed into a preallocated memory-mapped matrix and records
+    appended to documents.bin. Everything is written to a temporary directory
+    that replaces the index only when close() succeeds.
+    """
+
+    def __init__(self, path: str, count: int, dim: int, dtype: str = "float32", model: Optional[str] = None, source: Optional[str] = None):
+        """
+        Start writing an index
+
+        Args:
+            path: Index directory
+            count: Number of vectors that will be added
+            dim: Embedding dimension
+            dtype: Storage type, float32 or float16 (half the size, slightly lower precision)
+            model: Embedding model the vectors come from
+            source: Where the vectors were exported from
+        """
+        if dtype not in DTYPES:
+            raise ValueError(f"Unsupported dtype: {dtype} (expected one of {', '.join(DTYPES)})")
+        self.path = path
+        self.count = count
+        self.manifest = {"count": count, "dim": dim, "dtype": dtype, "normalized": True, "model": model, "source": source}
+        self._tmp = f"{path}.tmp"
+        shutil.rmtree(self._tmp, ignore_errors=True)
+        os.makedirs(self._tmp)
+        self._vectors = np.lib.format.open_memmap(os.path.join(self._tmp, "vectors.npy"), mode="w+", dtype=dtype, shape=(count, dim))
+        self._offsets = np.zeros(count + 1, dtype=np.int64)
+        self._documents = open(os.path.join(self._tmp, "documents.bin"), "wb")
+        self._written = 0
+
+    def add(self, vectors: Any, records: Iterable[Tuple[Dict[str, Any], str]]) -> None:
+        """
+        Append a batch
+
+        Args:
+            vectors: (n, dim) embeddings of the batch
+            records: The n (metadata, content) pairs of the batch, in the same order
+        """
+        vectors = _normalize(vectors)
+        end = self._written + len(vectors)
+        if end > self.count:
+            raise ValueError(f"Index was sized for {self.count} vectors")
+        self._vectors[self._written:end] = vectors
+        for i, (metadata, content) in enumerate(records, start=self._written):
+            encoded = json.dumps({"metadata": metadata or {}, "content": content}, ensure_ascii=False).encode("utf-8")
+            self._documents.write(encoded)
+            self._offsets[i + 1] = self._offsets[i] + len(encoded)
+        self._written = end
+
+    def close(self) -> None:
+        """Finish the index and move it into place"""
+        if self._written != self.count:
+            raise ValueError(f"Index was sized for {self.count} vectors, {self._written} were added")
+        self._vectors.flush()
+        del self._vectors
+        self._documents.close()
+        np.save(os.path.join(self._tmp, "offsets.npy"), self._offsets)
+        self.manifest["created_at"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        with open(os.path.join(self._tmp, "manifest.json"), "w") as f:
+            json.dump(self.manifest, f, indent=2)
+
+        previous = f"{self.path}.old"
+        shutil.rmtree(previous, ignore_errors=True)
+        if os.path.exists(self.path):
+            os.replace(self.path, previous)
+        os.replace(self._tmp, self.path)
+        shutil.rmtree(previous, ignore_errors=True)
+
+
+def _int8_codes(vectors: np.ndarray, scale: np.ndarray, offset: np.ndarray) -> np.ndarray:
+    codes = np.rint((vectors - offset) / scale) - 128
+    return np.clip(codes, -128, 127).astype(np.int8)
+
+
+def _kmeans(points: np.ndarray, clusters: int, iterations: int, rng: np.random.Generator) -> np.ndarray:
+    centroids = points[rng.choice(len(points), clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = _nearest(points, centroids)
+        sums = np.stack([np.bincount(assignment, weights=column, minlength=clusters) for column in points.T], axis=1)
+        counts = np.bincount(assignment, minlength=clusters)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+        # An empty cluster restarts at a random point
+        empty = np.flatnonzero(~filled)
+        if len(empty):
+            centroids[empty] = points[rng.choice(len(points), len(empty), replace=False)]
+    return centroids
+
+
+def _nearest(points: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    # argmin of ||p - c||^2 = ||p||^2 - 2 p.c + ||c||^2, without the constant ||p||^2
+    return np.argmin((centroids ** 2).sum(axis=1) - 2 * points @ centroids.T, axis=1)
+
+
+def quantize(
+    path: str = RAG_INDEX_PATH,
+    mode: str = "int8",
+    subspaces: int = 96,
+    sample: int = 50000,
+    iterations: int = 20,
+    block_rows: int = RAG_INDEX_BLOCK_ROWS,
+    seed: int = 0
+) -> Dict[str, Any]:
+    """
+    Add compressed codes of the vectors to an index
+
+    int8 maps every dimension linearly from its [min, max] onto 256 levels:
+    a quarter of float32, with a small error on every score. Product
+    quantization (pq) splits a vector into `subspaces` slices and stores, per
+    slice, the nearest of 256 k-means centroids: one byte per subspace, so
+    1536-dim ada-002 vectors take 96 bytes with 96 subspaces (1/64 of float32),
+    at a larger error. Either way the full-precision vectors stay on disk for
+    re-ranking (see VectorIndex).
+
+    Args:
+        path: Index directory
+        mode: "int8" or "pq"
+        subspaces: pq only, slices per vector; must divide the dimension
+        sample: pq only, rows the centroids are trained on
+        iterations: pq only, k-means iterations
+        block_rows: Rows encoded at a time
+        seed: Seed of the training sample
+
+    Returns:
+        Dict[str, Any]: The parameters recorded in the manifest
+    """
+    if mode not in QUANTIZATIONS[1:]:
+        raise ValueError(f"Unsupported quantization: {mode} (expected int8 or pq)")
+    with open(os.path.join(path, "manifest.json")) as f:
+        manifest = json.load(f)
+    vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+    count, dim = vectors.shape
+    if count == 0:
+        raise ValueError("Cannot quantize an empty index")
+    rng = np.random.default_rng(seed)
+    blocks = range(0, count, block_rows)
+
+    if mode == "int8":
+        low = np.full(dim, np.inf, dtype=np.float32)
+        high = np.full(dim, -np.inf, dtype=np.float32)
+        for start in blocks:
+            block = np.asarray(vectors[start:start + block_rows], dtype=np.float32)
+            low = np.minimum(low, block.min(axis=0))
+            high = np.maximum(high, block.max(axis=0))
+        scale = np.maximum(high - low, 1e-12) / 255
+        params = {"scale": scale, "offset": low}
+        shape, dtype = (count, dim), np.int8
+        encode = lambda block: _int8_codes(block, scale, low)
+        settings: Dict[str, Any] = {}
+    else:
+        if dim % subspaces:
+            raise ValueError(f"{subspaces} subspaces do not divide the dimension {dim}")
+        width = dim // subspaces
+        rows = np.sort(rng.choice(count, min(sample, count), replace=False))
+        training = np.asarray(vectors[rows], dtype=np.float32)
+        centroids = min(PQ_CENTROIDS, len(training))
+        codebooks = np.stack([
+            _kmeans(training[:, m * width:(m + 1) * width], centroids, iterations, rng)
+            for m in range(subspaces)
+        ])
+        params = {"centroids": codebooks}
+        shape, dtype = (count, subspaces), np.uint8
+        encode = lambda block: np.stack([
+            _nearest(block[:, m * width:(m + 1) * width], codebooks[m]) for m in range(subspaces)
+        ], axis=1).astype(np.uint8)
+        settings = {"subspaces": subspaces, "centroids": centroids, "trained_on": len(training)}
+
+    # Written next to the index and renamed into place, so an open index never sees half a file
+    codes = np.lib.format.open_memmap(os.path.join(path, f"{mode}.tmp.npy"), mode="w+", dtype=dtype, shape=shape)
+    for start in blocks:
+        codes[start:start + block_rows] = encode(np.asarray(vectors[start:start + block_rows], dtype=np.float32))
+    codes.flush()
+    del codes
+    np.savez(os.path.join(path, f"{mode}.tmp.npz"), **params)
+    os.replace(os.path.join(path, f"{mode}.tmp.npy"), os.path.join(path, f"{mode}.npy"))
+    os.replace(os.path.join(path, f"{mode}.tmp.npz"), os.path.join(path, f"{mode}.npz"))
+
+    settings["bytes"] = int(np.prod(shape)) * np.dtype(dtype).itemsize
+    manifest.setdefault("quantization", {})[mode] = settings
+    with open(os.path.join(path, "manifest.tmp.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(os.path.join(path, "manifest.tmp.json"), os.path.join(path, "manifest.json"))
+    return settings
+
+
+class VectorIndex:
+    """
+    Exact nearest-neighbour search over a memory-mapped embedding matrix
+
+    Vectors are L2-normalized, so the dot product ranks like cosine similarity
+    (and like the L2 distance Chroma uses, for normalized embeddings such as
+    OpenAI's). A search scores the matrix block by block with one matrix
+    product per block and keeps the best k with a partial sort, so its cost is
+    linear in the index size and independent of the data, with no tuning.
+
+    With quantization, the scan reads compressed codes instead (see quantize),
+    and only the best rerank * k candidates are scored again on the
+    full-precision vectors. The vectors are memory-mapped, so of them only the
+    pages holding candidates are read: the resident set is the codes plus a
+    working set that grows with the query load, not with the corpus.
+    """
+
+    def __init__(
+        self,
+        path: str = RAG_INDEX_PATH,
+        block_rows: int = RAG_INDEX_BLOCK_ROWS,
+        quantization: str = RAG_INDEX_QUANTIZATION,
+        rerank: int = RAG_INDEX_RERANK
+    ):
+        """
+        Open an index
+
+        Args:
+            path: Index directory
+            block_rows: Rows scored per matrix product
+            quantization: Codes to scan, "none", "int8" or "pq"
+            rerank: Candidates re-ranked on the vectors, as a multiple of k; 0 disables re-ranking
+
+        Raises:
+            FileNotFoundError: If there is no index at path, or no codes for the quantization
+        """
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unsupported quantization: {quantization} (expected one of {', '.join(QUANTIZATIONS)})")
+        self.path = path
+        self.block_rows = block_rows
+        self.quantization = quantization
+        self.rerank = rerank
+        with open(os.path.join(path, "manifest.json")) as f:
+            self.manifest: Dict[str, Any] = json.load(f)
+        self.vectors: np.ndarray = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        self.codes: Optional[np.ndarray] = None
+        self._params: Dict[str, np.ndarray] = {}
+        if quantization != "none":
+            if not os.path.exists(os.path.join(path, f"{quantization}.npy")):
+                raise FileNotFoundError(
+                    f"Index {path} has no {quantization} codes, run: python -m rag.vector_index quantize --mode {quantization}"
+                )
+            self.codes = np.load(os.path.join(path, f"{quantization}.npy"), mmap_mode="r")
+            with np.load(os.path.join(path, f"{quantization}.npz")) as params:
+                self._params = {name: params[name] for name in params.files}
+        self.offsets: np.ndarray = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+        self._file = open(os.path.join(path, "documents.bin"), "rb")
+        # mmap cannot map an empty file
+        self._documents = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.offsets[-1] else b""
+
+    def __len__(self) -> int:
+        return self.vectors.shape[0]
+
+    @property
+    def dim(self) -> int:
+        return self.vectors.shape[1]
+
+    @property
+    def scanned_bytes(self) -> int:
+        """Size of the arrays every search reads in full"""
+        if self.codes is None:
+            return self.vectors.nbytes
+        return self.codes.nbytes + sum(param.nbytes for param in self._params.values())
+
+    def document(self, i: int) -> Tuple[Dict[str, Any], str]:
+        """The (metadata, content) of row i, read on its own"""
+        record = json.loads(self._documents[int(self.offsets[i]):int(self.offsets[i + 1])])
+        return record["metadata"], record["content"]
+
+    def top_k(self, queries: Any, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Rows most similar to each query
+
+        Args:
+            queries: (dim,) or (q, dim) query embeddings
+            k: Rows per query
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (q, k) row numbers and (q, k) similarities,
+            most similar first; the similarities are approximate when codes are
+            scanned without re-ranking
+        """
+        queries = _normalize(np.atleast_2d(queries))
+        if queries.shape[1] != self.dim:
+            raise ValueError(f"Query dimension {queries.shape[1]} does not match the index dimension {self.dim}")
+        k = min(k, len(self))
+        if k <= 0:
+            return np.empty((len(queries), 0), dtype=np.int64), np.empty((len(queries), 0), dtype=np.float32)
+        if self.codes is None:
+            return self._scan(queries, k, lambda start, end: queries @ np.asarray(self.vectors[start:end], dtype=np.float32).T)
+
+        if self.quantization == "int8":
+            # q.x ~ q.(scale * (code + 128) + offset) = (q * scale).code + q.(128 * scale + offset)
+            scale, offset = self._params["scale"], self._params["offset"]
+            weighted = queries * scale
+            bias = queries @ (128 * scale + offset)
+            score = lambda start, end: weighted @ np.asarray(self.codes[start:end], dtype=np.float32).T + bias[:, None]
+        else:
+            # Per query and subspace, its dot product with each centroid; a row scores the sum of its centroids'
+            centroids = self._params["centroids"]
+            subspaces, _, width = centroids.shape
+            tables = np.einsum("qmw,mcw->mqc", queries.reshape(len(queries), subspaces, width), centroids)
+
+            def score(start: int, end: int) -> np.ndarray:
+                codes = np.asarray(self.codes[start:end])
+                scores = np.zeros((len(queries), end - start), dtype=np.float32)
+                for m in range(subspaces):
+                    scores += tables[m][:, codes[:, m]]
+                return scores
+
+        if self.rerank <= 0:
+            return self._scan(queries, k, score)
+        candidates, _ = self._scan(queries, min(k * self.rerank, len(self)), score)
+        ids = np.empty((len(queries), k), dtype=np.int64)
+        scores = np.empty((len(queries), k), dtype=np.float32)
+        for i, (query, rows) in enumerate(zip(queries, candidates)):
+            # Sorted rows read the memory-mapped vectors in file order
+            rows = np.sort(rows)
+            exact = np.asarray(self.vectors[rows], dtype=np.float32) @ query
+            best = np.argsort(-exact, kind="stable")[:k]
+            ids[i], scores[i] = rows[best], exact[best]
+        return ids, scores
+
+    def _scan(self, queries: np.ndarray, k: int, score: Callable[[int, int], np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """Best k rows per query by score(start, end), the (q, end - start) scores of a block of rows"""
+        best_ids = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        for start in range(0, len(self), self.block_rows):
+            scores = score(start, min(start + self.block_rows, len(self)))
+            if scores.shape[1] > k:
+                candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                scores = np.take_along_axis(scores, candidates, axis=1)
+            else:
+                candidates = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+            best_ids = np.concatenate([best_ids, candidates + start], axis=1)
+            best_scores = np.concatenate([best_scores, scores], axis=1)
+            if best_scores.shape[1] > k:
+                keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_ids = np.take_along_axis(best_ids, keep, axis=1)
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+
+        order = np.argsort(-best_scores, axis=1, kind="stable")
+        return np.take_along_axis(best_ids, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+    def search_many(self, queries: Any, k: int, filter: Optional[Dict[str, Any]] = None) -> List[Documents]:
+        """
+        Documents most similar to each query
+
+        Args:
+            queries: (q, dim) query embeddings
+            k: Documents per query
+            filter: Metadata fields a document must equal; applied to the best
+                k * RAG_INDEX_FILTER_OVERFETCH candidates, widened by the same
+                factor while fewer than k of them match
+
+        Returns:
+            List[Documents]: Per query, its (metadata, content) pairs, most similar first
+        """
+        if not filter:
+            return [[self.document(i) for i in row] for row in self.top_k(queries, k)[0]]
+
+        queries = np.atleast_2d(queries)
+        results = []
+        for query in queries:
+            fetch = k * RAG_INDEX_FILTER_OVERFETCH
+            while True:
+                row = self.top_k(query, fetch)[0][0]
+                documents = [document for document in map(self.document, row) if _matches(document[0], filter)]
+                # Widen the candidates until k documents match or every row was looked at
+                if len(documents) >= k or fetch >= len(self):
+                    break
+                fetch *= RAG_INDEX_FILTER_OVERFETCH
+            results.append(documents[:k])
+        return results
+
+    def close(self) -> None:
+        if isinstance(self._documents, mmap.mmap):
+            self._documents.close()
+        self._file.close()
+
+
+def export_from_chroma(
+    chroma_path: str,
+    index_path: str = RAG_INDEX_PATH,
+    dtype: str = "float32",
+    collection: str = "langchain",
+    batch_size: int = 5000,
+    model: Optional[str] = None
+) -> int:
+    """
+    Write the embeddings, documents and metadata of a Chroma collection as an index
+
+    Args:
+        chroma_path: Chroma persist directory
+        index_path: Index directory to (re)write
+        dtype: Storage type of the vectors
+        collection: Chroma collection; langchain's default is "langchain"
+        batch_size: Rows read from Chroma at a time
+        model: Embedding model recorded in the manifest
+
+    Returns:
+        int: Number of vectors exported
+    """
+    import chromadb
+
+    source = chromadb.PersistentClient(path=chroma_path).get_collection(collection)
+    count = source.count()
+    writer: Optional[IndexWriter] = None
+    for offset in range(0, count, batch_size):
+        batch = source.get(limit=batch_size, offset=offset, include=["embeddings", "documents", "metadatas"])
+        vectors = np.asarray(batch["embeddings"], dtype=np.float32)
+        if writer is None:
+            writer = IndexWriter(index_path, count, vectors.shape[1], dtype, model=model, source=os.path.abspath(chroma_path))
+        writer.add(vectors, zip(batch["metadatas"], batch["documents"]))
+        logger.info(f"Exported {min(offset + batch_size, count)}/{count} vectors")
+    if writer is None:
+        raise ValueError(f"Chroma collection {collection} at {chroma_path} is empty")
+    writer.close()
+    return count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Memory-mapped vector index")
+    parser.add_argument("--index", default=RAG_INDEX_PATH, help="index directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="export rag/Chroma into the index")
+    export.add_argument("--chroma", default="rag/Chroma", help="Chroma persist directory")
+    export.add_argument("--dtype", choices=DTYPES, default="float32")
+    export.add_argument("--quantize", choices=QUANTIZATIONS[1:], action="append", default=[], help="also write these codes (default subspaces)")
+    compress = commands.add_parser("quantize", help="add int8 or product-quantized codes to the index")
+    compress.add_argument("--mode", choices=QUANTIZATIONS[1:], default="int8")
+    compress.add_argument("--subspaces", type=int, default=96, help="pq: slices per vector, must divide the dimension")
+    compress.add_argument("--sample", type=int, default=50000, help="pq: rows the centroids are trained on")
+    commands.add_parser("info", help="print the manifest")
+    show = commands.add_parser("show", help="print one chunk")
+    show.add_argument("row", type=int)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        from rag.cache import retrieval_cache
+        from rag.run import EMBEDDING_MODEL
+
+        count = export_from_chroma(args.chroma, args.index, args.dtype, model=EMBEDDING_MODEL)
+        # A new export replaces the directory and with it any codes
+        for mode in args.quantize:
+            quantize(args.index, mode)
+        # Cached results may come from the previous index
+        retrieval_cache.invalidate()
+        print(f"Exported {count} vectors to {args.index}")
+        return
+    if args.command == "quantize":
+        from rag.cache import retrieval_cache
+
+        settings = quantize(args.index, args.mode, args.subspaces, args.sample)
+        # Searches scanning the new codes may rank differently
+        retrieval_cache.invalidate()
+        print(f"Wrote {args.mode} codes to {args.index}: {json.dumps(settings)}")
+        return
+
+    index = VectorIndex(args.index, quantization="none")
+    if args.command == "info":
+        print(json.dumps(index.manifest, indent=2))
+    elif not 0 <= args.row < len(index):
+        print(f"Row out of range, the index has {len(index)} rows")
+    else:
+        metadata, content = index.document(args.row)
+        print(f"Metadata for row {args.row}: {metadata}")
+        print(f"Document snippet: {content[:200]}...")
+    index.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
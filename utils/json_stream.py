@@ -0,0 +1,97 @@
+import json
+from typing import Any, Dict, List, Optional
+
+
+class StreamingArrayParser:
+    """
+    Incrementally scans a streamed JSON object and returns the items of one of its
+    top-level array fields as soon as each item is complete
+
+    Example:
+        parser = StreamingArrayParser("subProblems")
+        for chunk in chunks:
+            for item in parser.feed(chunk):
+                ...
+    """
+
+    def __init__(self, key: str):
+        """
+        Initialize the parser
+
+        Args:
+            key: Name of the top-level array field whose object items are extracted
+        """
+        self.key = key
+        self._buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        self._array_depth: Optional[int] = None
+        self._item_start: Optional[int] = None
+
+    @property
+    def text(self) -> str:
+        """Full text received so far"""
+        return self._buffer
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """
+        Add a chunk of the JSON document
+
+        Args:
+            chunk: Next piece of the streamed document
+
+        Returns:
+            Items of the target array completed by this chunk, in document order
+        """
+        self._buffer += chunk
+        items = []
+        buffer = self._buffer
+
+        for i in range(self._pos, len(buffer)):
+            char = buffer[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_string = buffer[self._string_start + 1:i]
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = i
+            elif char in "{[":
+                if char == "[" and self._depth == 1 and self._last_string == self.key:
+                    self._array_depth = self._depth + 1
+                elif char == "{" and self._array_depth is not None and self._depth == self._array_depth:
+                    self._item_start = i
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._array_depth is not None:
+                    if char == "}" and self._item_start is not None and self._depth == self._array_depth:
+                        item = self._load(buffer[self._item_start:i + 1])
+                        if item is not None:
+                            items.append(item)
+                        self._item_start = None
+                    elif char == "]" and self._depth == self._array_depth - 1:
+                        self._array_depth = None
+
+        self._pos = len(buffer)
+        return items
+
+    @staticmethod
+    def _load(text: str) -> Optional[Dict[str, Any]]:
+        try:
+            item = json.loads(text)
+        except json.JSONDecodeError:
+            return None
+        return item if isinstance(item, dict) else None